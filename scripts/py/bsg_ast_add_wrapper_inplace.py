@@ -10,35 +10,49 @@ DESIGN_NAME environment variable must be set.
 
 import inspect
 import logging
-import copy
 import os
 
 from pyverilog.vparser.ast import *
 
-def ast_add_wrapper_inplace( node, parent, name ):
+from bsg_ast_visitor import ast_find
 
-  ### Check for the design name env var
-  if 'DESIGN_NAME' not in os.environ:
+# ast_add_wrapper_inplace( node, parent, name, design_name=None )
+#
+# Find the toplevel module (design_name, or the DESIGN_NAME environment
+# variable when not given) and add a wrapper module called name to the front of
+# the definitions that contains it. The walk stops at the first match.
+#
+def ast_add_wrapper_inplace( node, parent, name, design_name=None ):
+
+  ### Check for the design name
+  if design_name is None:
+    design_name = os.environ.get('DESIGN_NAME')
+  if design_name is None:
     logging.warning('Must set the DESIGN_NAME environment variable to the toplevel module name to create a wrapper. Skipping!')
     return
 
   ### Handle module definitions (only care for the first one, no recursion here)
-  if type(node) == ModuleDef and node.name == os.environ['DESIGN_NAME']:
-    nodeCopy = copy.deepcopy(node)
-    nodeCopy.name = name
-    nodeCopy.items = []
-    for item in node.items:
-      if type(item) == Decl:
-        assert len(item.list) == 1
-        if type(item.list[0]) == Output or type(item.list[0]) == Input:
-          nodeCopy.items.append(item.list[0])
-    ports = [PortArg(p.name,Rvalue(Value(p.name))) for p in nodeCopy.items]
-    inst = Instance(node.name, "wrapper", ports, [])
-    nodeCopy.items.append(InstanceList(node.name, [], [inst]))
-    parent.definitions = (nodeCopy,) + parent.definitions
-
-  ### Recursivly walk down all other nodes
-  else:
-    for c in node.children():
-      ast_add_wrapper_inplace(c,node,name)
-
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    if module.name == design_name:
+      __add_wrapper_inplace( module, parent, name )
+      return
+
+# __add_wrapper_inplace( node, parent, name )
+#
+# Create the wrapper module for the toplevel module definition and add it to
+# the front of the parent's definitions. The wrapper is built directly from the
+# port declarations of the toplevel (which are shared with it, not copied) so
+# the rest of the toplevel module is never touched.
+#
+def __add_wrapper_inplace( node, parent, name ):
+  items = []
+  for item in node.items:
+    if type(item) == Decl:
+      assert len(item.list) == 1
+      if type(item.list[0]) == Output or type(item.list[0]) == Input:
+        items.append(item.list[0])
+  ports = [PortArg(p.name,Rvalue(Value(p.name))) for p in items]
+  inst = Instance(node.name, "wrapper", ports, [])
+  items.append(InstanceList(node.name, [], [inst]))
+  wrapper = ModuleDef(name, node.paramlist, node.portlist, items, node.default_nettype, node.lineno)
+  parent.definitions = (wrapper,) + parent.definitions
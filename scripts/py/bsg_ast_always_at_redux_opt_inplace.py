@@ -16,6 +16,8 @@ import logging
 
 from pyverilog.vparser.ast import *
 
+from bsg_ast_visitor import ast_find, ast_key
+
 # ast_always_at_redux_opt_inplace( node )
 #
 # Main optimization pass. This will go through the whole AST and find always
@@ -27,119 +29,140 @@ from pyverilog.vparser.ast import *
 # concat_redux_pass_inplace).
 #
 def ast_always_at_redux_opt_inplace( node ):
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    __always_at_redux_opt_module_inplace( module )
 
-  ### Stop at the module, the items list will have the always blocks
-
-  if type(node) == ModuleDef:
-
-    dont_touch_items = list()
-    always_blocks    = list()
-
-    ### Get all the always blocks
+# __always_at_redux_opt_module_inplace( node )
+#
+# Perform the always@ reduction on a single module definition. The module items
+# list will have all of the always blocks.
+#
+def __always_at_redux_opt_module_inplace( node ):
+  node.items = __always_at_redux_opt_items( node.items )
 
-    for item in node.items:
-      if type(item) == Always:
-        always_blocks.append(item)
+# __always_at_redux_opt_items( items )
+#
+# Perform the always@ reduction on a list of module items and return the new
+# items list (all other items followed by the merged always blocks).
+#
+def __always_at_redux_opt_items( items ):
+
+  dont_touch_items = list()
+  always_blocks    = list()
+
+  ### Get all the always blocks
+
+  for item in items:
+    if type(item) == Always:
+      always_blocks.append(item)
+    else:
+      dont_touch_items.append(item)
+
+  ### Combine like sens lists
+
+  # Bucket the always blocks by a hashable key of the sens list. The first
+  # block seen for each sens list keeps its place and the statements of every
+  # later block with the same sens list are appended to it in order.
+  sens_buckets = dict()
+  for a in always_blocks:
+    key = __sens_list_key(a.sens_list)
+    first = sens_buckets.get(key)
+    if first is None:
+      sens_buckets[key] = a
+    else:
+      first.statement.statements.extend(a.statement.statements)
+  always_blocks = list(sens_buckets.values())
+
+  ### Combine like if statemets and squash them
+
+  # The if statements are bucketed by a fingerprint of their condition
+  # skeleton (see __if_statement_key) that is computed once per statement.
+  # Each bucket keeps the position of its first statement and is merged in a
+  # single step. Anything other than an if statement is kept as is.
+  for a in always_blocks:
+    if_buckets = dict()
+    statements = list()
+    for stmt in a.statement.statements:
+      if type(stmt) != IfStatement:
+        statements.append(stmt)
+        continue
+      key = __if_statement_key(stmt)
+      group = if_buckets.get(key)
+      if group is None:
+        group = if_buckets[key] = [stmt]
+        statements.append(group)
       else:
-        dont_touch_items.append(item)
-
-    ### Combine like sens lists
-
-    top_index = 0
-    while top_index < len(always_blocks):
-      a = always_blocks[top_index]
-      bot_index = top_index + 1
-      while bot_index < len(always_blocks):
-        if a.sens_list == always_blocks[bot_index].sens_list:
-          a.statement.statements.extend(always_blocks.pop(bot_index).statement.statements)
-        else:
-          bot_index += 1
-      top_index += 1
-
-    ### Combine like if statemets and squash them
-
-    for a in always_blocks:
-      top_index = 0
-      while top_index < len(a.statement.statements):
-        bot_index = top_index + 1
-        while bot_index < len(a.statement.statements):
-          top_ifstmt = a.statement.statements[top_index]
-          bot_ifstmt = a.statement.statements[bot_index]
-          if __if_statement_eq(top_ifstmt, bot_ifstmt):
-            a.statement.statements[top_index] = __merge_if_statements(top_ifstmt,bot_ifstmt)
-            a.statement.statements.pop(bot_index)
-          else:
-            bot_index += 1
-        __squash_if_statement_inplace(a.statement.statements[top_index])
-        top_index += 1
-
-    node.items = dont_touch_items + always_blocks
-
-  ### Recursivly walk down all other nodes
+        group.append(stmt)
+    for i,stmt in enumerate(statements):
+      if type(stmt) == list:
+        statements[i] = __merge_if_statements(stmt)
+        __squash_if_statement_inplace(statements[i])
+    a.statement.statements = statements
 
-  else:
-    for c in node.children():
-      ast_always_at_redux_opt_inplace(c)
+  return dont_touch_items + always_blocks
+
+# __sens_list_key( sens_list )
+#
+# Canonical key for a sens list: the edge type and signal of each entry. Two
+# sens lists have the same key exactly when they compare equal.
+#
+def __sens_list_key( sens_list ):
+  return tuple([(s.type, ast_key(s.sig)) for s in sens_list.list])
 
-# __merge_if_statements( ifstmt1, ifstmt2 )
+# __merge_if_statements( ifstmts )
 #
-# Take the ast for two if statements and merge the block for each conditional
-# case. We have an invarient which is that ifstmt1 equals ifstmt2 (based on
-# the return of __if_statement_eq(...) function).
+# Take the ast for a list of if statements and merge the block for each
+# conditional case. We have an invarient which is that every if statement has
+# the same fingerprint (based on the return of __if_statement_key(...)
+# function). A single if statement is returned as is.
 #
-def __merge_if_statements( ifstmt1, ifstmt2 ):
+def __merge_if_statements( ifstmts ):
+
+  first = ifstmts[0]
+  if len(ifstmts) == 1:
+    return first
 
   # Merge false case
-  if type(ifstmt1.false_statement) == IfStatement:
-    merged_false = __merge_if_statements(ifstmt1.false_statement, ifstmt2.false_statement)
-  elif ifstmt1.false_statement:
-    merged_false = Block(ifstmt1.false_statement.statements + ifstmt2.false_statement.statements)
+  if type(first.false_statement) == IfStatement:
+    merged_false = __merge_if_statements([i.false_statement for i in ifstmts])
+  elif first.false_statement:
+    merged_false = Block([s for i in ifstmts for s in i.false_statement.statements])
   else:
     merged_false = None
 
   # Merge true case (for SEQGEN true statement will not be a nested if)
-  if type(ifstmt1.true_statement) == IfStatement:
-    merged_true = __merge_if_statements(ifstmt1.true_statement, ifstmt2.true_statement)
-  elif ifstmt1.true_statement:
-    merged_true = Block(ifstmt1.true_statement.statements + ifstmt2.true_statement.statements)
+  if type(first.true_statement) == IfStatement:
+    merged_true = __merge_if_statements([i.true_statement for i in ifstmts])
+  elif first.true_statement:
+    merged_true = Block([s for i in ifstmts for s in i.true_statement.statements])
   else:
     merged_true = None
 
   # Return new merged if statement ast
-  return IfStatement( ifstmt1.cond
+  return IfStatement( first.cond
                     , (merged_true  if merged_true  else None)
                     , (merged_false if merged_false else None) )
 
-# __if_statement_eq( ifstmt1, ifstmt2 )
+# __if_statement_key( ifstmt )
 #
-# Check if the two if-statement objects are considered equal. Equality
-# basically means that they have the same nest if structure and that every
-# conditional condition is the same.
+# Fingerprint of an if statement used to find the if statements that can be
+# merged. Two if statements have the same fingerprint when they have the same
+# nested if structure and every conditional condition is the same.
 #
-def __if_statement_eq( ifstmt1, ifstmt2 ):
-
-  # Check condition
-  if ifstmt1.cond != ifstmt2.cond:
-    return False
-
-  # Check false case
-  if type(ifstmt1.false_statement) == IfStatement and type(ifstmt2.false_statement) == IfStatement:
-    if not __if_statement_eq(ifstmt1.false_statement, ifstmt2.false_statement):
-      return False
-  else:
-    if not type(ifstmt1.false_statement) == type(ifstmt2.false_statement):
-      return False
-
-  # Check true case (for SEQGEN true statement will not be a nested if)
-  if type(ifstmt1.true_statement) == IfStatement and type(ifstmt2.true_statement) == IfStatement:
-    if not __if_statement_eq(ifstmt1.true_statement, ifstmt2.true_statement):
-      return False
-  else:
-    if not type(ifstmt1.true_statement) == type(ifstmt2.true_statement):
-      return False
+def __if_statement_key( ifstmt ):
+  return ( ast_key(ifstmt.cond)
+         , __if_branch_key(ifstmt.true_statement)
+         , __if_branch_key(ifstmt.false_statement) )
 
-  # Made it past all checks... we shall call these equal!
-  return True
+# __if_branch_key( stmt )
+#
+# Fingerprint for one case of an if statement. Nested if statements must match
+# structurally, for anything else only the type has to match.
+#
+def __if_branch_key( stmt ):
+  if type(stmt) == IfStatement:
+    return __if_statement_key(stmt)
+  return type(stmt)
 
 # __squash_if_statement_inplace( ifstmt )
 #
@@ -153,7 +176,6 @@ def __squash_if_statement_inplace( ifstmt ):
   if type(ifstmt.false_statement) == IfStatement:
     __squash_if_statement_inplace( ifstmt.false_statement )
   elif type(ifstmt.false_statement) == Block:
-    print(type(ifstmt))
     __squash_nonblocking_in_block_inplace( ifstmt.false_statement )
 
   # Squash true case 
@@ -175,32 +197,31 @@ def __squash_if_statement_inplace( ifstmt ):
 def __squash_nonblocking_in_block_inplace( block ):
 
   new_block_stmts = []
+  bus_groups      = dict()
 
-  while len(block.statements) != 0:
-    # Grab first in the list
-    bs = block.statements.pop(0)
+  # Group the bits of each bus in one pass. The group for a bus takes the place
+  # of the first assignment to that bus, anything else keeps its place.
+  for bs in block.statements:
     # Not a bus, just keep as is
     if type(bs.left.var) != Pointer:
       new_block_stmts.append(bs)
       continue
-    # Start a left and right concat list
-    lconcat = [bs.left.var]
-    rconcat = [bs.right.var]
-    # Traverse the rest of the list and try and find other parts of the bus
-    bot_index = 0
-    while bot_index < len(block.statements):
-      bbs = block.statements[bot_index]
-      # Check if they are part of the same bus
-      if type(bbs.left.var) == Pointer and bbs.left.var.var == bs.left.var.var:
-        lconcat.append(bbs.left.var)
-        rconcat.append(bbs.right.var)
-        block.statements.pop(bot_index)
-      else:
-        bot_index += 1
+    bus   = bs.left.var.var
+    key   = bus.name if type(bus) == Identifier and bus.scope is None else ast_key(bus)
+    group = bus_groups.get(key)
+    if group is None:
+      group = bus_groups[key] = []
+      new_block_stmts.append(group)
+    group.append((int(bs.left.var.ptr.value), bs.left.var, bs.right.var))
+
+  for i,group in enumerate(new_block_stmts):
+    if type(group) != list:
+      continue
     # Order the concat lists from MSB to LSB
-    lconcat, rconcat = zip(*sorted(zip(lconcat, rconcat), key=lambda x: int(x[0].ptr.value), reverse=True))
+    group.sort(key=lambda x: x[0], reverse=True)
+    lconcat = tuple([g[1] for g in group])
+    rconcat = tuple([g[2] for g in group])
     # Add the non-blocking assignment
-    new_block_stmts.append(NonblockingSubstitution(Lvalue(LConcat(lconcat)), Rvalue(Concat(rconcat))))
+    new_block_stmts[i] = NonblockingSubstitution(Lvalue(LConcat(lconcat)), Rvalue(Concat(rconcat)))
 
   block.statements = new_block_stmts
-
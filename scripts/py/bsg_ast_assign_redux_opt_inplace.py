@@ -0,0 +1,199 @@
+'''
+bsg_ast_assign_redux_opt_inplace.py
+
+This optimization pass will go through all of the continuous assigns to a
+single bit of a bus (mostly created by swapping GTECH gates, tie cells and
+TSGEN cells) and collapse the assigns to consecutive bits of the same bus into
+a single assign of a part-select of the bus (or the whole bus) with a concat on
+the right. After this pass, it is suggested to run the concat_redux_pass_inplace
+optimization to reform buses in the new concats.
+'''
+
+import logging
+
+from pyverilog.vparser.ast import *
+
+from bsg_ast_visitor import ast_find
+
+from bsg_ast_concat_redux_opt_inplace import __net_widths, __bus_step, __const_int
+
+# Operators that are always 1-bit wide
+__one_bit_ops = ( Ulnot, Uand, Unand, Uor, Unor, Uxor, Uxnor
+                , LessThan, GreaterThan, LessEq, GreaterEq
+                , Eq, NotEq, Eql, NotEql, Land, Lor )
+
+# Operators that are as wide as their widest operand
+__same_width_ops = ( Unot, Uplus, Uminus, Times, Plus, Minus, And, Xor, Xnor, Or )
+
+# Operators that are as wide as their left operand
+__left_width_ops = ( Sll, Srl, Sra, Power )
+
+# ast_assign_redux_opt_inplace( node )
+#
+# Main optimization pass. This will go through the whole AST and find the
+# continuous assigns to single bits of a bus. The assigns to each run of
+# consecutive bits of the same bus are replaced by one assign of the run from a
+# concat of the right hand sides.
+#
+def ast_assign_redux_opt_inplace( node ):
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    __assign_redux_opt_module_inplace( module )
+
+# __assign_redux_opt_module_inplace( node )
+#
+# Perform the assign reduction on a single module definition. Each new assign
+# takes the place of the first assign in its run, every other item keeps its
+# place. Only assigns whose right hand side is known to be 1-bit wide are
+# collapsed since anything wider would change width inside a concat.
+#
+def __assign_redux_opt_module_inplace( node ):
+
+  widths = __net_widths( node )
+  scalars, declared, memories = __net_scalars( node )
+
+  items      = list()
+  bus_groups = dict()
+
+  # Group the bits of each bus in one pass. The group for a bus takes the place
+  # of the first assign to that bus.
+  for item in node.items:
+    bit = __assign_bit( item, scalars, declared, memories )
+    if bit is None:
+      items.append(item)
+      continue
+    name  = item.left.var.var.name
+    group = bus_groups.get(name)
+    if group is None:
+      group = bus_groups[name] = []
+      items.append(group)
+    group.append((bit, item))
+
+  new_items = list()
+  for item in items:
+    if type(item) != list:
+      new_items.append(item)
+      continue
+    for run in __assign_runs( item, widths ):
+      if len(run) == 1:
+        new_items.append(run[0][1])
+      else:
+        new_items.append(__assign_run( run, widths ))
+
+  node.items = new_items
+
+# __assign_bit( item, scalars, declared, memories )
+#
+# Return the bit of the bus assigned by a continuous assign to a single
+# constant bit of a bus from a 1-bit wide expression, or None for any other
+# item (including an assign to a word of a memory).
+#
+def __assign_bit( item, scalars, declared, memories ):
+  if type(item) != Assign or item.ldelay or item.rdelay:
+    return None
+  lhs = item.left.var
+  if type(lhs) != Pointer or type(lhs.var) != Identifier or lhs.var.scope is not None:
+    return None
+  if lhs.var.name in memories:
+    return None
+  bit = __const_int(lhs.ptr)
+  if bit is None or not __is_one_bit( item.right.var, scalars, declared, memories ):
+    return None
+  return bit
+
+# __assign_runs( group, widths )
+#
+# Split the assigns to a bus into runs of consecutive bits ordered from the
+# MSB to the LSB of the bus. Every assign to a bit that is assigned more than
+# once is left alone as a run of its own so it is never merged with another
+# bit.
+#
+def __assign_runs( group, widths ):
+  drivers = dict()
+  for g in group:
+    drivers[g[0]] = drivers.get(g[0], 0) + 1
+
+  step = __bus_step( group[0][1].left.var.var, widths )
+  group.sort(key=lambda g: g[0] * step)
+  runs = []
+  for g in group:
+    if drivers[g[0]] > 1:
+      runs.append([g])
+      runs.append([])
+    elif runs and runs[-1] and g[0] - runs[-1][-1][0] == step:
+      runs[-1].append(g)
+    else:
+      runs.append([g])
+  return [r for r in runs if r]
+
+# __assign_run( run, widths )
+#
+# Create the assign for a run of bits. The left hand side is the bus name if
+# the run covers the whole declared bus and a part-select otherwise.
+#
+def __assign_run( run, widths ):
+  var   = run[0][1].left.var.var
+  left  = run[0][0]
+  right = run[-1][0]
+  if widths.get(var.name) == (left, right):
+    lhs = var
+  else:
+    lhs = Partselect(var, IntConst(str(left)), IntConst(str(right)))
+  rhs = Concat([r[1].right.var for r in run])
+  return Assign(Lvalue(lhs), Rvalue(rhs))
+
+# __is_one_bit( node, scalars, declared, memories )
+#
+# Check if an expression is known to be 1-bit wide. Undeclared identifiers are
+# implicit 1-bit nets. A select of a memory is a whole word, so it is only
+# 1-bit wide for a memory of 1-bit words.
+#
+def __is_one_bit( node, scalars, declared, memories ):
+  t = type(node)
+  if t == Pointer:
+    if type(node.var) == Identifier:
+      return node.var.name not in memories or memories[node.var.name]
+    return type(node.var) == Pointer and type(node.var.var) == Identifier and node.var.var.name in memories
+  if t == Identifier:
+    return node.scope is None and (node.name in scalars or node.name not in declared)
+  if t == IntConst:
+    return node.value.startswith('1\'')
+  if t == Partselect:
+    return __const_int(node.msb) is not None and __const_int(node.msb) == __const_int(node.lsb)
+  if t in __one_bit_ops:
+    return True
+  if t in __same_width_ops:
+    return all([__is_one_bit(c, scalars, declared, memories) for c in node.children()])
+  if t in __left_width_ops:
+    return __is_one_bit(node.left, scalars, declared, memories)
+  if t == Cond:
+    return __is_one_bit(node.true_value, scalars, declared, memories) and __is_one_bit(node.false_value, scalars, declared, memories)
+  if t == Concat:
+    return len(node.list) == 1 and __is_one_bit(node.list[0], scalars, declared, memories)
+  return False
+
+# __net_scalars( module )
+#
+# Return the set of names declared as 1-bit nets, the set of every name
+# declared in the module and a dict from the name of each memory to whether
+# its words are 1-bit wide. Memories can also be bare module items (the wire/reg
+# declaration pass does not put them back into a Decl).
+#
+def __net_scalars( module ):
+  scalars  = set()
+  declared = set()
+  memories = dict()
+  for item in module.items:
+    if type(item) == Decl:
+      decls = item.list
+    elif type(item) == WireArray or type(item) == RegArray:
+      decls = [item]
+    else:
+      continue
+    for d in decls:
+      names = d.name_list if type(d) == WireList or type(d) == RegList else [d.name]
+      declared.update(names)
+      if type(d) in (Input, Output, Inout, Wire, Reg, WireList, RegList) and d.width is None:
+        scalars.update(names)
+      elif type(d) == WireArray or type(d) == RegArray:
+        memories[d.name] = d.width is None
+  return (scalars, declared, memories)
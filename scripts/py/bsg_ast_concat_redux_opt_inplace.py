@@ -3,13 +3,18 @@ bsg_ast_concat_redux_opt_inplace.py
 
 This optimization pass will go through all of the concat statements and try and
 reduce the complexity of them by finding consecutive bits of the same bus and
-collapsing them into a single bus bit-select statement.
+collapsing them into a single bus bit-select statement. Using the declared
+widths of the module's nets, part-selects that cover an entire bus are
+replaced with just the bus name, and runs of identical items on the RHS are
+replaced with a replication.
 '''
 
 import logging
 
 from pyverilog.vparser.ast import *
 
+from bsg_ast_visitor import ast_find
+
 # ast_concat_redux_opt_inplace( node )
 # 
 # Main optimization pass. This will go through the whole AST and find LHS and
@@ -19,52 +24,170 @@ from pyverilog.vparser.ast import *
 # 
 def ast_concat_redux_opt_inplace( node ):
 
-  # Find LConcat or regular Concat objects
-  if type(node) == LConcat or type(node) == Concat:
-    __squash_concat_inplace(node)
+  # Find the modules first so the declared widths of the nets are known
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    widths = __net_widths( module )
+    for cc, cc_parent in ast_find( module, (LConcat, Concat) ):
+      __squash_concat_inplace(cc, widths)
+
+  # Concats outside of any module (when called on an expression)
+  if type(node) != ModuleDef:
+    for cc, cc_parent in ast_find( node, (LConcat, Concat, ModuleDef) ):
+      if type(cc) != ModuleDef:
+        __squash_concat_inplace(cc, {})
 
-  # Recursivly walk down all other nodes
-  else:
-    for c in node.children():
-      ast_concat_redux_opt_inplace(c)
+# __net_widths( module )
+#
+# Return a dict from net name to the (msb, lsb) integers of its declared width
+# for every vector net declared in the module with a constant width.
+#
+def __net_widths( module ):
+  widths = dict()
+  for item in module.items:
+    if type(item) != Decl:
+      continue
+    for d in item.list:
+      if d.width is None:
+        continue
+      msb = __const_int(d.width.msb)
+      lsb = __const_int(d.width.lsb)
+      if msb is None or lsb is None:
+        continue
+      if type(d) == WireList or type(d) == RegList:
+        for name in d.name_list:
+          widths[name] = (msb, lsb)
+      elif hasattr(d, 'name'):
+        widths[d.name] = (msb, lsb)
+  return widths
 
-# __squash_concat_inplace( cc )
+# __squash_concat_inplace( cc, widths )
 #
 # Take a concat object and try to reduce the number of items by finding
-# consecutive bits of the same bus and collapsing them into a single bus
-# bit-select statement.
+# consecutive bits (or part-selects) of the same bus and collapsing them into a
+# single bus bit-select statement. The runs follow the declared direction of
+# the bus (descending when the bus is not declared in the module). A
+# part-select that covers the whole declared bus becomes just the bus name. On
+# the RHS, runs of identical items are then replaced with a replication.
 #
-def __squash_concat_inplace( cc ):
-  
+def __squash_concat_inplace( cc, widths ):
+
   cc_vals = []
 
-  ptr_var   = None
-  ptr_start = None
-  ptr_end   = None
+  run_var    = None   ;# Bus for the current run of bits
+  run_start  = None   ;# Index node for the first bit of the run
+  run_end    = None   ;# Index node for the last bit of the run
+  run_step   = None   ;# +1 (ascending) or -1 (descending) index step
+  run_item   = None   ;# Original item when the run is a single bit or part-select
 
   for item in cc.list:
-    if type(item) == Pointer and not ptr_var:
-      ptr_var   = item.var
-      ptr_start = item.ptr
-      ptr_end   = item.ptr
-    elif type(item) == Pointer and ptr_var:
-      if ptr_var == item.var and int(ptr_end.value)-int(item.ptr.value) == 1:
-        ptr_end = item.ptr
-      else:
-        cc_vals.append(Partselect(ptr_var, ptr_start, ptr_end))
-        ptr_var   = item.var
-        ptr_start = item.ptr
-        ptr_end   = item.ptr
+
+    # Get the bus and bit range for a constant bit or part-select
+    if type(item) == Pointer:
+      var, start, end = item.var, item.ptr, item.ptr
+    elif type(item) == Partselect:
+      var, start, end = item.var, item.msb, item.lsb
     else:
-      if ptr_var:
-        cc_vals.append(Partselect(ptr_var, ptr_start, ptr_end))
-        ptr_var   = None
-        ptr_start = None
-        ptr_end   = None
+      var = None
+
+    if var is not None:
+      start_i = __const_int(start)
+      end_i   = __const_int(end)
+      if start_i is None or end_i is None:
+        var = None
+
+    if var is None:
+      if run_var is not None:
+        cc_vals.append(__run_item(run_var, run_start, run_end, run_item, widths))
+        run_var = None
+      cc_vals.append(item)
+      continue
+
+    step = __bus_step(var, widths)
+    if start_i != end_i and end_i - start_i != step * abs(end_i - start_i):
+      # Part-select against the direction of the bus, keep as is
+      if run_var is not None:
+        cc_vals.append(__run_item(run_var, run_start, run_end, run_item, widths))
+        run_var = None
       cc_vals.append(item)
+      continue
+
+    # Extend the current run
+    if run_var is not None and run_var == var and start_i - __const_int(run_end) == run_step:
+      run_end  = end
+      run_item = None
+      continue
+
+    # Start a new run
+    if run_var is not None:
+      cc_vals.append(__run_item(run_var, run_start, run_end, run_item, widths))
+    run_var   = var
+    run_start = start
+    run_end   = end
+    run_step  = step
+    run_item  = item
+
+  if run_var is not None:
+    cc_vals.append(__run_item(run_var, run_start, run_end, run_item, widths))
 
-  if ptr_var:
-    cc_vals.append(Partselect(ptr_var, ptr_start, ptr_end))
+  if type(cc) == Concat:
+    cc_vals = __replicate_runs(cc_vals)
 
   cc.list = cc_vals
 
+# __run_item( var, start, end, item, widths )
+#
+# Create the item for a run of bits. A run that covers the whole declared bus
+# is just the bus name, a run that is a single original bit or part-select is
+# kept as is and everything else is a new part-select.
+#
+def __run_item( var, start, end, item, widths ):
+  if type(var) == Identifier and var.scope is None:
+    if widths.get(var.name) == (__const_int(start), __const_int(end)):
+      return var
+  if item is not None:
+    return item
+  return Partselect(var, start, end)
+
+# __bus_step( var, widths )
+#
+# The index step from one bit to the next (MSB to LSB) for the bus. Busses that
+# are not declared in the module are assumed to be descending.
+#
+def __bus_step( var, widths ):
+  if type(var) == Identifier and var.name in widths:
+    msb, lsb = widths[var.name]
+    if msb < lsb:
+      return 1
+  return -1
+
+# __replicate_runs( items )
+#
+# Replace each run of identical items with a replication of that item.
+#
+def __replicate_runs( items ):
+  new_items = []
+  index = 0
+  while index < len(items):
+    item = items[index]
+    count = 1
+    while index+count < len(items) and items[index+count] == item:
+      count += 1
+    if count > 1:
+      new_items.append(Repeat(Concat([item]), IntConst(str(count))))
+    else:
+      new_items.append(item)
+    index += count
+  return new_items
+
+# __const_int( node )
+#
+# Return the integer value of a constant index node or None if the node is not
+# a plain integer constant.
+#
+def __const_int( node ):
+  if type(node) != IntConst:
+    return None
+  try:
+    return int(node.value)
+  except ValueError:
+    return None
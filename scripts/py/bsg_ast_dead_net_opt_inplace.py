@@ -0,0 +1,288 @@
+'''
+bsg_ast_dead_net_opt_inplace.py
+
+This optimization pass will go through all of the nets declared in a module
+and remove the ones that nothing reads (other than their own drivers) along
+with the logic that drives them. This is mostly the outputs of GTECH_ZERO and
+GTECH_ONE tie cells that are never read, the regs for unconnected QN outputs of
+SEQGEN cells and the nets left over from DesignCompiler's dummy net naming.
+Ports are never removed and instances that were not replaced are always kept
+(every net connected to them counts as read) since the direction of their pins
+is unknown.
+'''
+
+import logging
+
+from pyverilog.vparser.ast import *
+
+from bsg_ast_visitor import ast_find, ast_walk
+
+# Declarations of the nets that can be removed
+__net_types = (Wire, Reg, WireList, RegList)
+
+# ast_dead_net_opt_inplace( node )
+#
+# Main optimization pass. This will go through the whole AST and remove every
+# net that is not read along with the continuous assigns and always block
+# statements that drive it.
+#
+def ast_dead_net_opt_inplace( node ):
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    __dead_net_opt_module_inplace( module )
+
+# __dead_net_opt_module_inplace( node )
+#
+# Perform the dead net elimination on a single module definition. A driver
+# index is built from each net to the statements that drive it (continuous
+# assigns and the assignments inside always blocks) along with the nets each
+# statement reads. Starting from everything read by the items that are always
+# kept (ports, instances, anything this pass does not understand), every net
+# that is read is marked live and the statements that drive it mark the nets
+# they read in turn. Nets that are never marked are removed along with all of
+# their drivers, which also removes dead loops of nets that only read each
+# other.
+#
+def __dead_net_opt_module_inplace( node ):
+
+  nets = __removable_nets( node )
+
+  drivers = dict()    ;# Net name to the index of each statement driving it
+  stmts   = list()    ;# Names read and driven by each statement, None once live
+  index   = dict()    ;# Statement id to its index in stmts
+  live    = set()
+  work    = list()
+
+  for item in node.items:
+    t = type(item)
+    if t == Assign:
+      __index_stmt( item, [], nets, drivers, stmts, index, live, work )
+    elif t == Always and __is_prunable( item ):
+      sens = __read_names( item.sens_list )
+      for stmt, conds in __always_stmts( item.statement ):
+        __index_stmt( stmt, sens + conds, nets, drivers, stmts, index, live, work )
+    elif t != Decl:
+      __mark_live( __read_names( item ), live, work )
+    elif any([type(d) not in __net_types for d in item.list]):
+      # Identifiers in a declaration (widths or a net declaration assignment)
+      __mark_live( __read_names( item ), live, work )
+
+  # Follow the drivers of every live net
+  while work:
+    for i in drivers.get(work.pop(), ()):
+      if stmts[i] is not None:
+        reads, stmts[i] = stmts[i], None
+        __mark_live( reads, live, work )
+
+  dead = nets - live
+  logging.info("\t Dead net count: %d", len(dead))
+  if not dead:
+    return
+
+  kept = set([s for s,i in index.items() if stmts[i] is None])
+
+  new_items = []
+  for item in node.items:
+    t = type(item)
+    if t == Assign:
+      if id(item) not in kept:
+        continue
+    elif t == Always and __is_prunable( item ):
+      stmt = __prune_stmt( item.statement, kept )
+      if stmt is None:
+        continue
+      item.statement = stmt
+    elif t == Decl:
+      decls = __live_decls( item.list, dead )
+      if not decls:
+        continue
+      item.list = decls
+    new_items.append(item)
+
+  node.items = new_items
+
+# __index_stmt( stmt, reads, nets, drivers, stmts, index, live, work )
+#
+# Add a continuous assign or an assignment inside an always block to the driver
+# index. The reads are the names the statement reads outside of itself (the
+# sensitivity list and the if conditions it is under). A statement that drives
+# anything other than a removable net is live from the start. Names a statement
+# reads that it also drives are not counted, so a register that holds its own
+# value is still removed when nothing else reads it. Every target is marked
+# live along with the reads once the statement is live, so a net driven by a
+# kept statement (ie. part of a concat on the left hand side) always keeps its
+# declaration.
+#
+def __index_stmt( stmt, reads, nets, drivers, stmts, index, live, work ):
+
+  targets = []
+  reads   = reads + __read_names( stmt.right )
+  __lvalue_names( stmt.left.var, targets, reads )
+
+  i = len(stmts)
+  index[id(stmt)] = i
+  if stmt.ldelay or stmt.rdelay or not targets or any([t not in nets for t in targets]):
+    stmts.append(None)
+    __mark_live( reads + __read_names( stmt ), live, work )
+    return
+
+  stmts.append([r for r in reads if r not in targets] + targets)
+  for t in targets:
+    d = drivers.get(t)
+    if d is None:
+      drivers[t] = [i]
+    elif d[-1] != i:
+      d.append(i)
+
+# __mark_live( names, live, work )
+#
+# Mark each of the names as live and queue the ones that were not already
+# live so that their drivers are followed.
+#
+def __mark_live( names, live, work ):
+  for name in names:
+    if name not in live:
+      live.add(name)
+      work.append(name)
+
+# __read_names( node )
+#
+# Return the name of every identifier in the AST under node.
+#
+def __read_names( node ):
+  return [n.name for n, parent in ast_walk( node ) if type(n) == Identifier]
+
+# __lvalue_names( node, targets, reads )
+#
+# Split the names in the left hand side of an assignment into the nets that
+# are driven (added to targets) and the names read by the index expressions
+# (added to reads). A hierarchical name is added to the targets as None so
+# that it is never treated as a removable net.
+#
+def __lvalue_names( node, targets, reads ):
+  stack = [node]
+  while stack:
+    n = stack.pop()
+    t = type(n)
+    if t == Identifier:
+      targets.append(n.name if n.scope is None else None)
+    elif t == LConcat:
+      stack.extend(n.list)
+    elif t == Pointer:
+      reads.extend(__read_names( n.ptr ))
+      stack.append(n.var)
+    elif t == Partselect:
+      reads.extend(__read_names( n.msb ) + __read_names( n.lsb ))
+      stack.append(n.var)
+    else:
+      targets.append(None)
+      reads.extend(__read_names( n ))
+
+# __is_prunable( always )
+#
+# Check if an always block is only made of begin/end blocks, if statements and
+# assignments (the always blocks created for SEQGEN cells).
+#
+def __is_prunable( always ):
+  stack = [always.statement]
+  while stack:
+    s = stack.pop()
+    t = type(s)
+    if t == Block:
+      stack.extend(s.statements)
+    elif t == IfStatement:
+      stack.extend([b for b in (s.true_statement, s.false_statement) if b is not None])
+    elif t != NonblockingSubstitution and t != BlockingSubstitution:
+      return False
+  return True
+
+# __always_stmts( stmt )
+#
+# Generator that yields a (statement, conds) tuple for every assignment in the
+# statement of an always block. The conds are the names read by the conditions
+# of all of the if statements the assignment is under.
+#
+def __always_stmts( stmt ):
+  stack = [(stmt, [])]
+  while stack:
+    s, conds = stack.pop()
+    t = type(s)
+    if t == Block:
+      stack.extend([(b, conds) for b in reversed(s.statements)])
+    elif t == IfStatement:
+      conds = conds + __read_names( s.cond )
+      if s.false_statement is not None:
+        stack.append((s.false_statement, conds))
+      if s.true_statement is not None:
+        stack.append((s.true_statement, conds))
+    elif s is not None:
+      yield (s, conds)
+
+# __prune_stmt( stmt, kept )
+#
+# Return the statement of an always block without the assignments that are not
+# kept, or None if nothing is left. An if statement with nothing left in either
+# branch is removed since the conditions have no side effects.
+#
+def __prune_stmt( stmt, kept ):
+  t = type(stmt)
+  if t == Block:
+    stmts = [s for s in [__prune_stmt(b, kept) for b in stmt.statements] if s is not None]
+    if not stmts:
+      return None
+    stmt.statements = stmts
+    return stmt
+  if t == IfStatement:
+    true_stmt  = __prune_stmt( stmt.true_statement, kept )
+    false_stmt = __prune_stmt( stmt.false_statement, kept )
+    if true_stmt is None and false_stmt is None:
+      return None
+    stmt.true_statement  = true_stmt if true_stmt is not None else Block([])
+    stmt.false_statement = false_stmt
+    return stmt
+  if stmt is None or id(stmt) not in kept:
+    return None
+  return stmt
+
+# __removable_nets( module )
+#
+# Return the set of names of the wires and regs declared in the module that
+# are not ports. Nets declared with an assignment (or next to anything other
+# than a plain wire or reg) are never removed.
+#
+def __removable_nets( module ):
+  nets  = set()
+  ports = set()
+  for item in module.items:
+    if type(item) != Decl:
+      continue
+    plain = all([type(d) in __net_types for d in item.list])
+    for d in item.list:
+      t = type(d)
+      if t == WireList or t == RegList:
+        names = d.name_list
+      elif hasattr(d, 'name'):
+        names = [d.name]
+      else:
+        continue
+      if plain and t in __net_types:
+        nets.update(names)
+      else:
+        ports.update(names)
+  return nets - ports
+
+# __live_decls( decls, dead )
+#
+# Return the declarations without the dead nets.
+#
+def __live_decls( decls, dead ):
+  new_decls = []
+  for d in decls:
+    t = type(d)
+    if t == WireList or t == RegList:
+      d.name_list = [n for n in d.name_list if n not in dead]
+      if not d.name_list:
+        continue
+    elif t in __net_types and d.name in dead:
+      continue
+    new_decls.append(d)
+  return new_decls
@@ -0,0 +1,333 @@
+'''
+bsg_ast_net_inline_opt_inplace.py
+
+This optimization pass will go through all of the 1-bit nets that are driven
+by a continuous assign (mostly the outputs of GTECH gates and DesignCompiler's
+sv2v_dc_* dummy nets) and inline the nets that are read exactly once back into
+the expression that reads them, which can be another 1-bit assign, the right
+hand side of an always block assignment (ie. the next state of a SEQGEN cell)
+or an item of a concat. The wire declaration and the assign for every inlined
+net are removed. Chains of the same associative operator (and, or, xor) are
+then flattened into a single n-ary chain so that a gate cone is printed
+without any nested parenthesis, and double inversions are dropped.
+'''
+
+import logging
+
+from pyverilog.vparser.ast import *
+
+from bsg_ast_visitor import ast_find, ast_walk, ast_fold
+
+# Expression nodes walked by this pass and the attributes holding their
+# operands. Anything else is left as is.
+__expr_attrs = { Rvalue : ('var',)
+               , Unot   : ('right',)
+               , And    : ('left', 'right')
+               , Or     : ('left', 'right')
+               , Xor    : ('left', 'right')
+               , Xnor   : ('left', 'right')
+               , Cond   : ('cond', 'true_value', 'false_value') }
+
+# Associative operators that are flattened into n-ary chains
+__assoc_ops = (And, Or, Xor)
+
+# Assignments inside always blocks
+__subst_types = (NonblockingSubstitution, BlockingSubstitution)
+
+# ast_net_inline_opt_inplace( node )
+#
+# Main optimization pass. This will go through the whole AST and inline every
+# 1-bit net with a single reader into the expression that reads it and flatten
+# chains of and, or and xor operators.
+#
+def ast_net_inline_opt_inplace( node ):
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    __net_inline_opt_module_inplace( module )
+
+# __net_inline_opt_module_inplace( node )
+#
+# Perform the net inlining on a single module definition. A net is inlined
+# when it is a declared 1-bit wire (not a port), it is driven by exactly one
+# continuous assign whose right hand side is a tree of bitwise operators over
+# 1-bit operands, and it is used exactly once anywhere else in the module at a
+# place where any such tree keeps its value: an operand of a bit tree assigned
+# to a 1-bit net (by an assign or inside an always block) or an item of a
+# concat, which is always sized on its own. Every other statement is a root
+# that the inlined nets are folded into, so a cone is inlined no matter what
+# reads its last net.
+#
+def __net_inline_opt_module_inplace( node ):
+
+  (ports, scalar_wires, scalars, declared, memories) = __net_decls( node )
+
+  # Count every use of each net name, find the assign driving each net (a net
+  # with more than one driving assign is marked with None) and gather every
+  # continuous assign and always block assignment
+  uses    = dict()
+  drivers = dict()
+  stmts   = []
+  for item, parent in ast_walk( node, (Decl,) ):
+    t = type(item)
+    if t == Identifier:
+      uses[item.name] = uses.get(item.name, 0) + 1
+    elif t == Assign and parent is node:
+      stmts.append(item)
+      if type(item.left.var) == Identifier:
+        name = item.left.var.name
+        drivers[name] = None if name in drivers else item
+    elif t in __subst_types:
+      stmts.append(item)
+
+  # Names read at a place a net can be inlined into
+  sites = set()
+  for stmt in stmts:
+    bits  = __bit_roots( stmt, scalars, declared, memories )
+    stack = [stmt.right]
+    while stack:
+      n = stack.pop()
+      if type(n) == Identifier and n.scope is None and id(n) in bits:
+        sites.add(n.name)
+      stack.extend(__site_children( n, bits, scalars, declared, memories ) or ())
+
+  # Nets that can be inlined, mapped to the expression that drives them
+  inline = dict()
+  for name, assign in drivers.items():
+    if assign is None or uses[name] != 2 or name not in sites or name in ports or name not in scalar_wires:
+      continue
+    if assign.ldelay or assign.rdelay or assign.left.var.scope is not None:
+      continue
+    if __is_bit_tree( assign.right.var, scalars, declared, memories ):
+      inline[name] = assign.right.var
+
+  # Inline the nets into the statements that read them (following chains of
+  # inlined nets) and flatten the operator chains. Each net is removed from the
+  # inline table once it is used, so anything left over was never reached from
+  # a root (a loop of nets only read by each other) and is kept as is.
+  candidates = set(inline)
+  for stmt in stmts:
+    lhs = stmt.left.var
+    if type(stmt) == Assign and type(lhs) == Identifier and lhs.name in candidates:
+      continue
+    bits = __bit_roots( stmt, scalars, declared, memories )
+    ast_fold( stmt.right, __rebuild, lambda n: __inline_children(n, inline, bits, scalars, declared, memories) )
+
+  inlined = candidates - set(inline)
+  logging.info("\t Inlined net count: %d", len(inlined))
+
+  node.items = __drop_nets( node.items, inlined )
+
+# __bit_roots( stmt, scalars, declared, memories )
+#
+# Return the set of ids of the nodes of the right hand side of a statement
+# that are in a 1-bit context: the whole right hand side when it is a bit tree
+# assigned to a 1-bit net and nothing otherwise (concat items are added while
+# walking with __site_children(...)).
+#
+def __bit_roots( stmt, scalars, declared, memories ):
+  if __is_bit_lvalue( stmt.left.var, scalars, declared, memories ) and __is_bit_tree( stmt.right.var, scalars, declared, memories ):
+    return set([id(stmt.right)])
+  return set()
+
+# __children( node )
+#
+# The operands of an expression node walked by this pass (None for any other
+# node).
+#
+def __children( node ):
+  attrs = __expr_attrs.get(type(node))
+  if attrs is None:
+    return None
+  return [getattr(node, a) for a in attrs]
+
+# __site_children( node, bits, scalars, declared, memories )
+#
+# The operands of an expression node walked by this pass and the items of a
+# concat (None for any other node so that it is a leaf of the fold). The
+# operands of a node in a 1-bit context (its id is in bits) and the concat
+# items that are bit trees are added to bits, since a 1-bit net read there can
+# be replaced by any bit tree without changing the value of the expression.
+#
+def __site_children( node, bits, scalars, declared, memories ):
+  t = type(node)
+  if t == Concat:
+    kids = list(node.list)
+    bits.update([id(k) for k in kids if __is_bit_tree( k, scalars, declared, memories )])
+    return kids
+  kids = __children(node)
+  if kids is not None and id(node) in bits:
+    bits.update([id(k) for k in kids])
+  return kids
+
+# __inline_children( node, inline, bits, scalars, declared, memories )
+#
+# Same as __site_children(...) but every operand in a 1-bit context that is an
+# inlined net is replaced by the expression driving it (which is then walked
+# as well).
+#
+def __inline_children( node, inline, bits, scalars, declared, memories ):
+  kids = __site_children( node, bits, scalars, declared, memories )
+  if kids is None or not inline:
+    return kids
+  for i,k in enumerate(kids):
+    if type(k) == Identifier and k.scope is None and k.name in inline and id(k) in bits:
+      kids[i] = inline.pop(k.name)
+      bits.add(id(kids[i]))
+  return kids
+
+# __rebuild( node, values )
+#
+# Set the operands of an expression node to their folded values. A chain of
+# the same associative operator is rebuilt left-deep (ie. ((a & b) & c) & d)
+# which the emitter prints as a single n-ary expression (a & b & c & d). A
+# double inversion (from inlining an inverting gate into a NOT) is dropped. A
+# concat with a new item is copied rather than changed since the concats of
+# the instances lowered from a CellTable are shared.
+#
+def __rebuild( node, values ):
+  t = type(node)
+  if t == Concat:
+    if all([v is k for v, k in zip(values, node.list)]):
+      return node
+    return Concat(tuple(values), lineno=node.lineno)
+  attrs = __expr_attrs.get(t)
+  if attrs is None:
+    return node
+  for a, v in zip(attrs, values):
+    setattr(node, a, v)
+  if t == Unot and type(node.right) == Unot:
+    return node.right.right
+  if t not in __assoc_ops or (type(node.left) != t and type(node.right) != t):
+    return node
+  operands = __chain_operands(node.left, t) + __chain_operands(node.right, t)
+  chain = operands[0]
+  for o in operands[1:]:
+    chain = t(chain, o)
+  return chain
+
+# __chain_operands( node, t )
+#
+# The operands of a left-deep chain of operator t in order (just the node
+# itself if it is not a t operator).
+#
+def __chain_operands( node, t ):
+  operands = []
+  while type(node) == t:
+    operands.append(node.right)
+    node = node.left
+  operands.append(node)
+  operands.reverse()
+  return operands
+
+# __is_bit_tree( node, scalars, declared, memories )
+#
+# Check if an expression is a tree of bitwise operators (and conditionals)
+# whose operands are all 1-bit nets, bits of a bus, 1-bit memory words or 1-bit
+# constants. Undeclared identifiers are implicit 1-bit nets.
+#
+def __is_bit_tree( node, scalars, declared, memories ):
+  stack = [node]
+  while stack:
+    n = stack.pop()
+    t = type(n)
+    if t == Identifier:
+      if n.scope is not None or (n.name in declared and n.name not in scalars):
+        return False
+    elif t == Pointer:
+      if not __is_bit_select( n, memories ):
+        return False
+    elif t == IntConst:
+      if not n.value.startswith('1\''):
+        return False
+    elif t in __expr_attrs and t != Rvalue:
+      stack.extend(__children(n))
+    else:
+      return False
+  return True
+
+# __is_bit_lvalue( node, scalars, declared, memories )
+#
+# Check if the left hand side of an assignment is a 1-bit net, a bit of a bus
+# or a 1-bit memory word.
+#
+def __is_bit_lvalue( node, scalars, declared, memories ):
+  if type(node) == Pointer:
+    return __is_bit_select( node, memories )
+  if type(node) == Identifier:
+    return node.scope is None and (node.name in scalars or node.name not in declared)
+  return False
+
+# __is_bit_select( node, memories )
+#
+# Check if a pointer with a constant index selects a single bit: a bit of a
+# bus, a word of a memory with 1-bit words or a bit of a memory word.
+#
+def __is_bit_select( node, memories ):
+  if type(node.ptr) != IntConst:
+    return False
+  if type(node.var) == Identifier:
+    return node.var.name not in memories or memories[node.var.name]
+  return type(node.var) == Pointer and type(node.var.var) == Identifier and node.var.var.name in memories
+
+# __net_decls( module )
+#
+# Return the set of port names, the set of 1-bit wire names, the set of every
+# 1-bit net name (including ports and regs), the set of every name declared
+# in the module and a dict from the name of each memory to whether its words
+# are 1-bit wide. Memories can also be bare module items (the wire/reg
+# declaration pass does not put them back into a Decl).
+#
+def __net_decls( module ):
+  ports        = set()
+  scalar_wires = set()
+  scalars      = set()
+  declared     = set()
+  memories     = dict()
+  for item in module.items:
+    if type(item) == Decl:
+      decls = item.list
+    elif type(item) == WireArray or type(item) == RegArray:
+      decls = [item]
+    else:
+      continue
+    for d in decls:
+      t = type(d)
+      names = d.name_list if t == WireList or t == RegList else [d.name]
+      declared.update(names)
+      if t == Input or t == Output or t == Inout:
+        ports.update(names)
+      if d.width is None and t in (Input, Output, Inout, Wire, Reg, WireList, RegList):
+        scalars.update(names)
+        if t == Wire or t == WireList:
+          scalar_wires.update(names)
+      elif t == WireArray or t == RegArray:
+        memories[d.name] = d.width is None
+  return (ports, scalar_wires, scalars, declared, memories)
+
+# __drop_nets( items, names )
+#
+# Return the module items without the wire declarations and driving assigns
+# of the named nets.
+#
+def __drop_nets( items, names ):
+  if not names:
+    return items
+  new_items = []
+  for item in items:
+    if type(item) == Assign:
+      if type(item.left.var) == Identifier and item.left.var.name in names:
+        continue
+    elif type(item) == Decl:
+      decls = []
+      for d in item.list:
+        if type(d) == WireList:
+          d.name_list = [n for n in d.name_list if n not in names]
+          if not d.name_list:
+            continue
+        elif type(d) == Wire and d.name in names:
+          continue
+        decls.append(d)
+      if not decls:
+        continue
+      item.list = decls
+    new_items.append(item)
+  return new_items
@@ -0,0 +1,147 @@
+'''
+bsg_ast_pass_manager.py
+
+This file contains the pass manager that runs the swap, optimization and
+wrapper passes. Rather than walking the whole AST once per pass (and having
+every pass split the module items apart and rebuild them), each ModuleDef is
+visited once and every enabled pass is run on it in turn while it is still hot
+in the cache. The lists produced by the swap are handed straight to the
+wire/reg pass so the items list is only built once per module.
+'''
+
+import os
+import time
+import logging
+
+from pyverilog.vparser.ast import *
+
+from bsg_ast_visitor import ast_find
+
+from bsg_profile import profile_enabled, profile_step, profile_module
+
+from bsg_netlist_ir import cell_table_count
+
+from bsg_ast_walk_and_swap_inplace import __swap_module_items, __swap_compose_items
+from bsg_ast_wire_reg_decl_opt_inplace import __sort_decl, __wire_reg_decl_items
+from bsg_ast_always_at_redux_opt_inplace import __always_at_redux_opt_items
+from bsg_ast_dead_net_opt_inplace import __dead_net_opt_module_inplace
+from bsg_ast_net_inline_opt_inplace import __net_inline_opt_module_inplace
+from bsg_ast_assign_redux_opt_inplace import __assign_redux_opt_module_inplace
+from bsg_ast_concat_redux_opt_inplace import ast_concat_redux_opt_inplace
+from bsg_ast_add_wrapper_inplace import __add_wrapper_inplace
+
+# ast_convert_inplace( node, options )
+#
+# Run every enabled pass on each module definition in the AST. The options
+# are the parsed command line arguments (reg_bus_opt, wire_reg_decl_opt,
+# always_at_redux_opt, dead_net_opt, net_inline_opt, assign_redux_opt,
+# concat_redux_opt, wrapper and design_name). Returns the total number of (gtech, synth,
+# generic) replacements made, the same as ast_walk_and_swap_inplace(...).
+#
+def ast_convert_inplace( node, options ):
+
+  gtech_swap_count     = 0
+  synthetic_swap_count = 0
+  generic_swap_count   = 0
+
+  ### Check for the design name (only needed for the wrapper)
+  wrapper     = options.wrapper
+  design_name = options.design_name or os.environ.get('DESIGN_NAME')
+  if wrapper and design_name is None:
+    logging.warning('Must set the DESIGN_NAME environment variable to the toplevel module name to create a wrapper. Skipping!')
+    wrapper = None
+
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    (gtech,synth,generic) = __convert_module_inplace( module, options )
+    gtech_swap_count     += gtech
+    synthetic_swap_count += synth
+    generic_swap_count   += generic
+
+    # Only the first toplevel module found is wrapped
+    if wrapper and module.name == design_name:
+      t = time.perf_counter()
+      __add_wrapper_inplace( module, parent, wrapper )
+      profile_step( 'wrapper', time.perf_counter() - t )
+      wrapper = None
+
+  return (gtech_swap_count, synthetic_swap_count, generic_swap_count)
+
+# __convert_module_inplace( node, options )
+#
+# Run the swap and every enabled optimization pass on a single module
+# definition. Returns the replacement counts from the swap. When profiling,
+# the time for each pass is recorded for the module.
+#
+def __convert_module_inplace( node, options ):
+
+  profiling = profile_enabled()
+  if profiling:
+    name  = node.name
+    count = cell_table_count( node.items )
+    times = dict()
+    t     = time.perf_counter()
+
+  (ports, wires, regs, assigns, asts, counts) = __swap_module_items( node, options.reg_bus_opt )
+  if profiling and options.wire_reg_decl_opt: t = __lap( times, 'swap', t )
+
+  # Wire / Reg Declartion Optimization. The declarations from the swap are
+  # sorted directly instead of being wrapped in Decls and split apart again.
+  if options.wire_reg_decl_opt:
+    decl_ports = list()
+    decl_wires = list()
+    decl_regs  = list()
+    decl_asts  = list()
+    for decls in (ports, wires.values(), regs.values()):
+      for d in decls:
+        if d:
+          __sort_decl( d, decl_ports, decl_wires, decl_regs, decl_asts )
+    items = __wire_reg_decl_items( decl_ports, decl_wires, decl_regs, decl_asts + assigns + asts )
+    if profiling: t = __lap( times, 'wire_reg_decl_opt', t )
+  else:
+    items = __swap_compose_items( ports, wires, regs, assigns, asts )
+    if profiling: t = __lap( times, 'swap', t )
+
+  # Always@ Reduction Optimization
+  if options.always_at_redux_opt:
+    items = __always_at_redux_opt_items( items )
+    if profiling: t = __lap( times, 'always_at_redux_opt', t )
+
+  node.items = items
+
+  # Dead Net Optimization (before the net inlining so that the readers that
+  # are removed do not count as uses)
+  if options.dead_net_opt:
+    __dead_net_opt_module_inplace( node )
+    if profiling: t = __lap( times, 'dead_net_opt', t )
+
+  # Net Inlining Optimization
+  if options.net_inline_opt:
+    __net_inline_opt_module_inplace( node )
+    if profiling: t = __lap( times, 'net_inline_opt', t )
+
+  # Assign Reduction Optimization (before the concat reduction so that the new
+  # concats are reduced as well)
+  if options.assign_redux_opt:
+    __assign_redux_opt_module_inplace( node )
+    if profiling: t = __lap( times, 'assign_redux_opt', t )
+
+  # Concatination Reduction Optimization
+  if options.concat_redux_opt:
+    ast_concat_redux_opt_inplace( node )
+    if profiling: t = __lap( times, 'concat_redux_opt', t )
+
+  if profiling:
+    profile_module( name, count, counts, times )
+
+  return counts
+
+# __lap( times, name, start )
+#
+# Record the time since start for the named pass of a module and return the
+# current time.
+#
+def __lap( times, name, start ):
+  now = time.perf_counter()
+  times[name] = now - start
+  profile_step( name, now - start )
+  return now
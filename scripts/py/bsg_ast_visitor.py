@@ -0,0 +1,118 @@
+'''
+bsg_ast_visitor.py
+
+This file contains the traversal utilities shared by all of the passes. Rather
+than recursing through node.children() (which needs a raised recursion limit
+and still falls over on deep expression trees from long GTECH cascades or
+SELECT_OP condition chains), these walk the AST with an explicit stack so there
+is no depth limit and much less per-node overhead from python frames.
+'''
+
+from pyverilog.vparser.ast import *
+
+# ast_walk( node, stop_types=() )
+#
+# Generator that walks the AST in pre-order (the same order as recursing
+# through node.children()) and yields a (node, parent) tuple for every node.
+# Nodes whose exact type is in stop_types are yielded but their children are
+# not walked. This matches the common pass structure of "if type(node) == X
+# handle it, otherwise recurse into the children". The node yielded can be
+# modified in place by the caller before the walk continues.
+#
+def ast_walk( node, stop_types=() ):
+
+  stack = [(node, None)]
+  pop   = stack.pop
+  push  = stack.append
+
+  while stack:
+    n, parent = pop()
+    yield (n, parent)
+    if type(n) in stop_types:
+      continue
+    children = n.children()
+    for i in range(len(children)-1, -1, -1):
+      push((children[i], n))
+
+# ast_find( node, types )
+#
+# Generator that yields a (node, parent) tuple for every node whose exact type
+# is in types without walking into the nodes that are found. This is the
+# typical way a pass finds every ModuleDef in the AST.
+#
+def ast_find( node, types ):
+  for n, parent in ast_walk( node, types ):
+    if type(n) in types:
+      yield (n, parent)
+
+# ast_fold( node, func, children )
+#
+# Iterative post-order fold over the AST. children(n) returns the sequence of
+# child nodes to visit for n (entries may be None) and func(n, values) is
+# called once the values for all of those children have been computed. A None
+# child has a value of None. Returns the value computed for the root node. This
+# is used for bottom up rewrites such as generating the text for an expression.
+#
+def ast_fold( node, func, children ):
+
+  values = []
+  stack  = [(node, None)]
+  pop    = stack.pop
+  push   = stack.append
+
+  while stack:
+    n, kids = pop()
+
+    # Second time we see a node, all of its children values are on the top of
+    # the value stack
+    if kids is not None:
+      k    = len(kids)
+      args = values[-k:]
+      del values[-k:]
+      values.append(func(n, args))
+      continue
+
+    if n is None:
+      values.append(None)
+      continue
+
+    kids = children(n)
+    if not kids:
+      values.append(func(n, ()))
+      continue
+
+    push((n, kids))
+    for i in range(len(kids)-1, -1, -1):
+      push((kids[i], None))
+
+  return values[0]
+
+# ast_key( node )
+#
+# Return a hashable structural key for the node. Two nodes have the same key
+# exactly when they compare equal with pyverilog's Node.__eq__ (same type, same
+# attribute values and equal children), so the key can be used to bucket nodes
+# in a dict instead of comparing them pairwise.
+#
+def ast_key( node ):
+  return ast_fold( node, __key, __key_children )
+
+def __key_children( node ):
+  return node.children()
+
+def __key( node, values ):
+  attrs = []
+  for a in node.attr_names:
+    v = getattr(node, a)
+    attrs.append(tuple(v) if type(v) == list else v)
+  return (type(node), tuple(attrs), tuple(values))
+
+# ast_drop_lineno_inplace( node )
+#
+# Set the line number of every node in the AST to 0 so that the int objects
+# for the line numbers (one for every line of the netlist) can be freed. The
+# generated verilog does not depend on the line numbers.
+#
+def ast_drop_lineno_inplace( node ):
+  for n, parent in ast_walk( node ):
+    n.lineno = 0
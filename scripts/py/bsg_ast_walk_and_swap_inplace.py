@@ -1,139 +1,189 @@
 '''
 ast_walk_and_swap_inplace.py
 
-This file contains the ast_walk_and_swap_inplace function which recursivly
-walks through an AST and performs any modifications that we need. The main
+This file contains the ast_walk_and_swap_inplace function which walks through
+an AST and performs any modifications that we need. The main
 modification is the replacement of GTECH, SYNTHETIC and GENERIC instances back
 into RTL.
 '''
 
-import inspect
+import time
 import logging
+import collections
 
 from pyverilog.vparser.ast import *
 
-import bsg_gtech_modules
-import bsg_synthetic_modules
-import bsg_generic_modules
-
-# Small utility function that helps generate a dictionary with all of the
-# functions found in an imported module. This function is used to generate 3
-# dicts that hold all of the replacement functions for GTECH, SYNTHETIC and
-# GENERIC modules. All utility functions begin with __ so they should not
-# collide with any module instances found inside the converted verilog.
-def get_all_functions( module ):
-  funcs = dict()
-  for n,v in inspect.getmembers( module ):
-    if inspect.isfunction(v):
-      funcs[n] = v
-  return funcs
-
-gtech_modules_funcs     = get_all_functions( bsg_gtech_modules )
-synthetic_modules_funcs = get_all_functions( bsg_synthetic_modules )
-generic_modules_funcs   = get_all_functions( bsg_generic_modules )
+from bsg_ast_visitor import ast_find
+
+from bsg_profile import profile_enabled, profile_cell
+
+from bsg_netlist_ir import CellTable, cell_table_instances, cell_table_count
+
+from bsg_cell_registry import CELL_KINDS, lookup_cell
+
+from bsg_reg_bus_opt import reg_bus_instances
 
 # ast_walk_and_swap_inplace
 #
-# This function recursivly walks through an AST and performs any modifications
-# that we need. These modifications happen in-place (ie. it will modify the AST
-# that is passed in and doesn't return a new one). The main modification is
-# replacing GTECH, SYNTHETIC and GENERIC constructrs for synthesizable RTL.
+# This function walks through an AST and performs any modifications that we
+# need. These modifications happen in-place (ie. it will modify the AST that is
+# passed in and doesn't return a new one). The main modification is replacing
+# GTECH, SYNTHETIC and GENERIC constructrs for synthesizable RTL.
 def ast_walk_and_swap_inplace( node ):
 
   gtech_swap_count     = 0
   synthetic_swap_count = 0
   generic_swap_count   = 0
 
-  ### Handle module definitions
-  if type(node) == ModuleDef:
-    
-    number_of_items      = len(node.items)
-
-    logging.info("Module Name: %s" % node.name)
-    logging.info("\t Item Count: %d" % number_of_items)
-
-    ports = list()  ;# List of all port declarations (input and output statements)
-    wires = list()  ;# List of all wire datatype declarations
-    regs = list()   ;# List of all reg datatype declarations
-    assigns = list();# List of all new assigns to add to the ast
-    asts = list()   ;# All other ast inside the module (everything else)
-
-    # Go through every AST inside the module definition
-    for item in node.items:
-
-      # If the item is a declaration
-      if type(item) == Decl:
-        for d in item.list:
-
-          # Explict wire declaration for output ports
-          if type(d) == Output:
-            wires.append(Wire(d.name, d.width, d.signed))
-
-          # Split all decl
-          if type(d) == Wire:
-            if d not in wires:
-              wires.append(d)
-          else:
-            ports.append(d)
-
-      # If the item is an instance list. For elaborated netlist, every instance
-      # list has exactly 1 instantiation.
-      elif type(item) == InstanceList:
-
-        assert len(item.instances) == 1   ;# Assert our assumptions are true
-
-        instance = item.instances[0]
-        modname  = instance.module.replace('*','').replace('\\','')
-        modline  = instance.lineno
-
-        # Perform a GTECH gate replacement
-        if modname in gtech_modules_funcs:
-          logging.debug("\t GTECH replacement found -- %s, line: %d" % (modname, modline))
-          gtech_swap_count += 1
-          asts.append(gtech_modules_funcs[modname]( instance ))
-
-        # Perform a SYNTHETIC module replacement
-        elif modname in synthetic_modules_funcs:
-          logging.debug("\t SYNTHETIC replacement found -- %s, line: %d" % (modname, modline))
-          synthetic_swap_count += 1
-          asts.append(synthetic_modules_funcs[modname]( instance ))
-
-        # Perform a GENERIC cell replacement
-        elif modname in generic_modules_funcs:
-          logging.debug("\t GENERIC replacement found -- %s, line: %d" % (modname, modline))
-          generic_swap_count += 1
-          asts.append(generic_modules_funcs[modname]( instance, wires, regs, assigns ))
-
-        # Instance not found in replacement lists (either a DesignCompiler
-        # construct we don't know about or a module that is defined earlier in
-        # the file). Do nothing to this item.
-        else:
-          logging.debug("\t No replacement found -- %s, line: %d" % (modname, modline))
-          asts.append(item)
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    (gtech,synth,generic) = __swap_module_inplace( module )
+    gtech_swap_count     += gtech
+    synthetic_swap_count += synth
+    generic_swap_count   += generic
+
+  return (gtech_swap_count, synthetic_swap_count, generic_swap_count)
 
-      # Keep all other items
+# __swap_module_inplace( node )
+#
+# Perform the replacements for a single module definition and return the
+# number of GTECH, SYNTHETIC and GENERIC replacements made.
+def __swap_module_inplace( node ):
+  (ports, wires, regs, assigns, asts, counts) = __swap_module_items( node )
+  node.items = __swap_compose_items( ports, wires, regs, assigns, asts )
+  return counts
+
+# __swap_module_items( node, reg_bus_opt=False )
+#
+# Perform the replacements for a single module definition without rebuilding
+# the items list. When reg_bus_opt is set, the SEQGEN cells of each multi-bit
+# register are merged and replaced as one. Returns the list of ports, the wire and reg declaration
+# tables, the list of new assigns and all other items that make up the new
+# module along with the replacement counts. This lets the pass manager hand
+# them straight to the next pass.
+#
+# The wire and reg declaration tables are dicts keyed by the net name (dicts
+# keep insertion order so the declaration order is unchanged). This gives
+# constant time membership checks rather than a structural compare against
+# every wire in the module, and lets the generic cell replacements add or
+# promote a reg in constant time.
+def __swap_module_items( node, reg_bus_opt=False ):
+
+  # Number of GTECH, SYNTHETIC and GENERIC replacements (see CELL_KINDS)
+  swap_counts          = [0] * len(CELL_KINDS)
+
+  number_of_items      = cell_table_count(node.items)
+
+  logging.info("Module Name: %s", node.name)
+  logging.info("\t Item Count: %d", number_of_items)
+
+  # Number of instances of each cell type found (by replacement kind). These
+  # are logged once per module rather than one line per instance.
+  cell_counts = collections.Counter()
+
+  # Time each replacement function when profiling (see bsg_profile.py)
+  profiling = profile_enabled()
+
+  ports = list()  ;# List of all port declarations (input and output statements)
+  wires = dict()  ;# Table of all wire datatype declarations (by name)
+  regs = dict()   ;# Table of all reg datatype declarations (by name)
+  assigns = list();# List of all new assigns to add to the ast
+  asts = list()   ;# All other ast inside the module (everything else)
+
+  # Go through every instance inside the module definition (all other items
+  # are sorted into the ports, wires and asts as they are found)
+  instances = __module_instances( node.items, ports, wires, asts )
+
+  # Merge the SEQGEN cells of each multi-bit register (see bsg_reg_bus_opt.py)
+  if reg_bus_opt:
+    instances = reg_bus_instances( instances, wires )
+
+  for instance, item, count in instances:
+
+      # Find the replacement for this cell (see bsg_cell_registry.py)
+      (modname, kind, func, takes_tables) = lookup_cell( instance.module )
+
+      # Instance not found in the registry (either a DesignCompiler construct
+      # we don't know about or a module that is defined earlier in the file).
+      # Do nothing to this item.
+      if func is None:
+        cell_counts[('No', modname)] += count
+        asts.append(item or InstanceList(instance.module, (), (instance,)))
+        continue
+
+      # Perform a GTECH, SYNTHETIC or GENERIC replacement. GENERIC cells may
+      # add to the declaration tables and assigns.
+      cell_counts[(CELL_KINDS[kind], modname)] += count
+      swap_counts[kind] += count
+      if profiling: t = time.perf_counter()
+      if takes_tables:
+        asts.append(func( instance, wires, regs, assigns ))
       else:
-        asts.append(item)
-
-    # Log some statistics
-    logging.info("\t GTECH swap Count: %d (%d%%)" % (gtech_swap_count, (gtech_swap_count/number_of_items)*100))
-    logging.info("\t SYNTHETIC swap Count: %d (%d%%)" % (synthetic_swap_count, (synthetic_swap_count/number_of_items)*100))
-    logging.info("\t GENERIC swap Count: %d (%d%%)" % (generic_swap_count, (generic_swap_count/number_of_items)*100))
-
-    # Compose a new items list for the module definition
-    node.items = [Decl([p]) for p in ports if p]   \
-                 + [Decl([w]) for w in wires if w] \
-                 + [Decl([r]) for r in regs if r]  \
-                 + [a for a in assigns if a]       \
-                 + [a for a in asts if a]
-
-  ### Recursivly walk down all other nodes
-  else:
-    for c in node.children():
-      (gtech,synth,generic) = ast_walk_and_swap_inplace(c)
-      gtech_swap_count     += gtech
-      synthetic_swap_count += synth
-      generic_swap_count   += generic
+        asts.append(func( instance ))
+      if profiling: profile_cell(modname, time.perf_counter() - t)
 
-  return (gtech_swap_count, synthetic_swap_count, generic_swap_count)
+  # Log some statistics
+  if logging.getLogger().isEnabledFor(logging.DEBUG):
+    for (kind, modname), count in cell_counts.items():
+      logging.debug("\t %s replacement found -- %s, count: %d", kind, modname, count)
+
+  if logging.getLogger().isEnabledFor(logging.INFO):
+    percent = 100 / max(number_of_items, 1)
+    for kind, count in zip(CELL_KINDS, swap_counts):
+      logging.info("\t %s swap Count: %d (%d%%)", kind, count, count*percent)
+
+  return (ports, wires, regs, assigns, asts, tuple(swap_counts))
+
+# __module_instances( items, ports, wires, asts )
+#
+# Generator over the instances of a module. Yields an (instance, item, count)
+# tuple for each instance, where item is the original InstanceList (None for
+# an instance lowered from a cell table) and count is the number of netlist
+# cells the instance stands for. Declarations are sorted into the ports and
+# wires and every other item is appended to the asts as they are found.
+#
+def __module_instances( items, ports, wires, asts ):
+
+  for item in items:
+
+    # If the item is a declaration
+    if type(item) == Decl:
+      for d in item.list:
+
+        # Explict wire declaration for output ports
+        if type(d) == Output:
+          if d.name not in wires:
+            wires[d.name] = Wire(d.name, d.width, d.signed)
+
+        # Split all decl
+        if type(d) == Wire:
+          if d.name not in wires:
+            wires[d.name] = d
+        else:
+          ports.append(d)
+
+    # If the item is an instance list. For elaborated netlist, every instance
+    # list has exactly 1 instantiation.
+    elif type(item) == InstanceList:
+      assert len(item.instances) == 1   ;# Assert our assumptions are true
+      yield (item.instances[0], item, 1)
+
+    # If the item is a table of instances read straight from the netlist (see
+    # bsg_netlist_ir.py), each instance is lowered right before its swap
+    elif type(item) == CellTable:
+      for instance in cell_table_instances(item):
+        yield (instance, None, 1)
+
+    # Keep all other items
+    else:
+      asts.append(item)
+
+# __swap_compose_items( ports, wires, regs, assigns, asts )
+#
+# Compose a new items list for the module definition.
+def __swap_compose_items( ports, wires, regs, assigns, asts ):
+  return [Decl([p]) for p in ports if p]            \
+         + [Decl([w]) for w in wires.values() if w] \
+         + [Decl([r]) for r in regs.values() if r]  \
+         + [a for a in assigns if a]       \
+         + [a for a in asts if a]
 
@@ -11,6 +11,8 @@ import logging
 
 from pyverilog.vparser.ast import *
 
+from bsg_ast_visitor import ast_find, ast_key
+
 # ast_wire_reg_decl_opt_inplace( node )
 # 
 # This optimization pass takes all the wires and regs in the module definition
@@ -19,80 +21,95 @@ from pyverilog.vparser.ast import *
 # wires and regs making the outputed netlist much cleaner.
 # 
 def ast_wire_reg_decl_opt_inplace( node ):
-
-  # Find modules definitions
-  if type(node) == ModuleDef:
-
-    ports = list()  ;# List of all port declarations (input and output statements)
-    wires = list()  ;# List of all wire datatype declarations
-    regs = list()   ;# List of all reg datatype declarations
-    asts = list()   ;# All other ast inside the module (everything else)
-
-    # Split up all items into lists of ports, wires, regs and other asts
-    for item in node.items:
-      if type(item) == Decl:
-        assert len(item.list) == 1
-        if type(item.list[0]) == Output or type(item.list[0]) == Input:
-          ports.append(item.list[0])
-        elif type(item.list[0]) == Wire:
-          wires.append(item.list[0])
-        elif type(item.list[0]) == Reg:
-          regs.append(item.list[0])
-        else:
-          asts.append(item.list[0])
-      else:
-        asts.append(item)
-
-    # Group wires based on width and sign
-    wire_groups = []
-
-    top_index = 0
-    while top_index < len(wires):
-      ref_wire = wires[top_index]
-      group = [ref_wire]
-      bot_index = top_index + 1
-      while bot_index < len(wires):
-        if ref_wire.signed == wires[bot_index].signed and ref_wire.width == wires[bot_index].width:
-          group.append(wires.pop(bot_index))
-        else:
-          bot_index += 1
-      wire_groups.append(group)
-      top_index += 1
-
-    # Create a WireList for each group of wires
-    wire_lists = []
-    for group in wire_groups:
-      wire_lists.append( WireList( [w.name for w in group], group[0].width, group[0].signed ) )
-
-    # Group regs based on width and sign
-    reg_groups = []
-
-    top_index = 0
-    while top_index < len(regs):
-      ref_reg = regs[top_index]
-      group = [ref_reg]
-      bot_index = top_index + 1
-      while bot_index < len(regs):
-        if ref_reg.signed == regs[bot_index].signed and ref_reg.width == regs[bot_index].width:
-          group.append(regs.pop(bot_index))
-        else:
-          bot_index += 1
-      reg_groups.append(group)
-      top_index += 1
-
-    # Create a RegList for each group of regs
-    reg_lists = []
-    for group in reg_groups:
-      reg_lists.append( RegList( [w.name for w in group], group[0].width, group[0].signed ) )
-
-    # Reconstruct the new items for the module
-    node.items = [Decl([p]) for p in ports if p]        \
-                 + [Decl([w]) for w in wire_lists if w] \
-                 + [Decl([r]) for r in reg_lists if r]  \
-                 + [a for a in asts if a]
-
-  # Recursivly walk down all other nodes
+  for module, parent in ast_find( node, (ModuleDef,) ):
+    __wire_reg_decl_opt_module_inplace( module )
+
+# __wire_reg_decl_opt_module_inplace( node )
+#
+# Consolodate the wires and regs of a single module definition.
+#
+def __wire_reg_decl_opt_module_inplace( node ):
+
+  ports = list()  ;# List of all port declarations (input and output statements)
+  wires = list()  ;# List of all wire datatype declarations
+  regs = list()   ;# List of all reg datatype declarations
+  asts = list()   ;# All other ast inside the module (everything else)
+
+  # Split up all items into lists of ports, wires, regs and other asts
+  for item in node.items:
+    if type(item) == Decl:
+      assert len(item.list) == 1
+      __sort_decl( item.list[0], ports, wires, regs, asts )
+    else:
+      asts.append(item)
+
+  node.items = __wire_reg_decl_items( ports, wires, regs, asts )
+
+# __sort_decl( decl, ports, wires, regs, asts )
+#
+# Append a single declaration to the list of ports, wires, regs or other asts.
+#
+def __sort_decl( decl, ports, wires, regs, asts ):
+  if type(decl) == Output or type(decl) == Input:
+    ports.append(decl)
+  elif type(decl) == Wire:
+    wires.append(decl)
+  elif type(decl) == Reg:
+    regs.append(decl)
   else:
-    for c in node.children():
-      ast_wire_reg_decl_opt_inplace(c)
-
+    asts.append(decl)
+
+# __wire_reg_decl_items( ports, wires, regs, asts )
+#
+# Group the wires and regs into WireLists and RegLists and return the new
+# items list for the module.
+#
+def __wire_reg_decl_items( ports, wires, regs, asts ):
+
+  # Create a WireList for each group of wires
+  wire_lists = []
+  for group in __group_decls( wires ):
+    wire_lists.append( WireList( [w.name for w in group], group[0].width, group[0].signed ) )
+
+  # Create a RegList for each group of regs
+  reg_lists = []
+  for group in __group_decls( regs ):
+    reg_lists.append( RegList( [w.name for w in group], group[0].width, group[0].signed ) )
+
+  # Reconstruct the new items for the module
+  return [Decl([p]) for p in ports if p]        \
+         + [Decl([w]) for w in wire_lists if w] \
+         + [Decl([r]) for r in reg_lists if r]  \
+         + [a for a in asts if a]
+
+# __group_decls( decls )
+#
+# Group wires or regs based on width and sign. Each declaration is keyed once
+# (see __decl_key) and the groups are built with a dict in a single pass. The
+# groups are in the order of their first declaration.
+#
+def __group_decls( decls ):
+  groups = dict()
+  for d in decls:
+    key = __decl_key(d)
+    group = groups.get(key)
+    if group is None:
+      groups[key] = [d]
+    else:
+      group.append(d)
+  return list(groups.values())
+
+# __decl_key( decl )
+#
+# Normalize the width and sign of a declaration to a hashable key. Two
+# declarations have the same key exactly when their widths compare equal and
+# they have the same sign. Widths in the elaborated netlist are nearly always
+# constant so (signed, msb, lsb) is used directly for those.
+#
+def __decl_key( decl ):
+  w = decl.width
+  if w is None:
+    return (decl.signed, None)
+  if type(w.msb) == IntConst and type(w.lsb) == IntConst:
+    return (decl.signed, w.msb.value, w.lsb.value)
+  return (decl.signed, ast_key(w))
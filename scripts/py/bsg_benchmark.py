@@ -0,0 +1,214 @@
+'''
+usage: bsg_benchmark.py [-h] [-sizes list] [-work_dir dir] [-repeat N]
+                        [-sv2v_options options] [-module_size N] [-width N]
+                        [-seed N] [-json file] [-baseline file]
+                        [-tolerance F]
+                        [-loglvl {debug,info,warning,error,critical}]
+
+This script benchmarks bsg_elab_to_rtl.py on synthetic netlists of increasing
+size and reports the throughput, scaling and peak memory of each run.
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -sizes list           Comma separated number of instances for each netlist
+                        (suffixes k and M are allowed).
+  -work_dir dir         Directory for the generated netlists and outputs.
+  -repeat N             Number of runs for each size (the fastest is kept).
+  -sv2v_options options
+                        Extra options passed to bsg_elab_to_rtl.py.
+  -module_size N        Number of instances in each module.
+  -width N              Width of the buses in each module.
+  -seed N               Seed for the netlist generator.
+  -json file            Write the results to a JSON file.
+  -baseline file        Compare against the JSON results from an earlier run.
+  -tolerance F          Allowed slowdown or memory growth over the baseline.
+  -loglvl {debug,info,warning,error,critical}
+                        Set the logging level
+
+The netlists are written by bsg_gen_netlist.py and kept in the work directory
+so that later runs with the same generator options reuse them. Each run of
+bsg_elab_to_rtl.py is done with -profile so the time of each step is reported
+along with the wall time and peak RSS. The scaling column is the slope of the
+wall time against the size on a log-log scale from the previous size (1.0 is
+linear). When a baseline is given, the exit code is non-zero if the throughput
+or peak memory of any size is worse than the baseline by more than the
+tolerance.
+'''
+
+import os
+import sys
+import json
+import time
+import math
+import shlex
+import shutil
+import logging
+import argparse
+import subprocess
+
+from bsg_gen_netlist import parse_count, generate_netlist
+
+# Path to the conversion script
+__elab_to_rtl = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bsg_elab_to_rtl.py')
+
+# run_benchmark( instances, args )
+#
+# Generate (or reuse) the netlist for the given number of instances and
+# convert it args.repeat times. Returns a dict with the results of the fastest
+# run.
+#
+def run_benchmark( instances, args ):
+
+  netlist = os.path.join(args.work_dir, 'bench_%d_w%d_m%d_s%d.v' % (instances, args.width, args.module_size, args.seed))
+  if not os.path.exists(netlist):
+    logging.info('Generating netlist with %d instances: %s', instances, netlist)
+    with open(netlist + '.tmp', 'w') as fid:
+      generate_netlist( fid, instances, args.module_size, args.width, seed=args.seed )
+    os.replace(netlist + '.tmp', netlist)
+
+  outfile = os.path.join(args.work_dir, 'bench_%d.sv2v.v' % instances)
+  profile = os.path.join(args.work_dir, 'bench_%d.profile.json' % instances)
+
+  cmd = [ sys.executable, __elab_to_rtl
+        , '-i', netlist
+        , '-o', outfile
+        , '-loglvl', 'warning'
+        , '-profile', profile ] + args.sv2v_options
+
+  best = None
+  for i in range(args.repeat):
+    logging.info('Converting %d instances (run %d of %d)', instances, i+1, args.repeat)
+    wall, peak_rss_kb = __run( cmd )
+    if best is None or wall < best['wall_time']:
+      with open(profile, 'r') as fid:
+        steps = json.load(fid)['steps']
+      best = { 'instances'   : instances
+             , 'netlist_mb'  : os.path.getsize(netlist) / 2**20
+             , 'wall_time'   : wall
+             , 'throughput'  : instances / wall
+             , 'peak_rss_mb' : peak_rss_kb / 1024
+             , 'steps'       : dict((name, step['time']) for name,step in steps.items()) }
+
+  return best
+
+# __run( cmd )
+#
+# Run the command and return the wall time in seconds and the peak RSS in
+# kilobytes of the process (including any worker processes it waited on).
+#
+def __run( cmd ):
+  start = time.perf_counter()
+  proc  = subprocess.Popen(cmd)
+  pid, status, usage = os.wait4(proc.pid, 0)
+  wall = time.perf_counter() - start
+  proc.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+  if proc.returncode != 0:
+    raise subprocess.CalledProcessError(proc.returncode, cmd)
+  return (wall, usage.ru_maxrss)
+
+# report( results )
+#
+# Log a table of the results with the scaling from the previous size.
+#
+def report( results ):
+  logging.info('%12s %10s %10s %14s %10s %8s', 'instances', 'size(MB)', 'time(s)', 'instances/s', 'rss(MB)', 'scaling')
+  prev = None
+  for r in results:
+    if prev and r['instances'] != prev['instances'] and prev['wall_time'] > 0:
+      scaling = '%8.2f' % ( math.log(r['wall_time'] / prev['wall_time'])
+                          / math.log(r['instances'] / prev['instances']) )
+    else:
+      scaling = '%8s' % '-'
+    logging.info( '%12d %10.1f %10.2f %14.0f %10.1f %s'
+                , r['instances'], r['netlist_mb'], r['wall_time'], r['throughput'], r['peak_rss_mb'], scaling )
+    logging.debug('\t %s', ', '.join(['%s: %.2fs' % s for s in r['steps'].items()]))
+    prev = r
+
+# compare_baseline( results, baseline, tolerance )
+#
+# Compare the results against the results of an earlier run. Returns the
+# number of sizes where the throughput or peak memory got worse by more than
+# the tolerance.
+#
+def compare_baseline( results, baseline, tolerance ):
+  base = dict((r['instances'], r) for r in baseline['results'])
+  regressions = 0
+  for r in results:
+    b = base.get(r['instances'])
+    if b is None:
+      logging.warning('No baseline for %d instances. Skipping!', r['instances'])
+      continue
+    if r['throughput'] < b['throughput'] * (1 - tolerance):
+      logging.error( 'Throughput regression for %d instances: %.0f instances/s (baseline %.0f)'
+                   , r['instances'], r['throughput'], b['throughput'] )
+      regressions += 1
+    if r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + tolerance):
+      logging.error( 'Peak memory regression for %d instances: %.1f MB (baseline %.1f MB)'
+                   , r['instances'], r['peak_rss_mb'], b['peak_rss_mb'] )
+      regressions += 1
+  return regressions
+
+### Setup the argument parsing
+
+desc = '''
+This script benchmarks bsg_elab_to_rtl.py on synthetic netlists of increasing
+size and reports the throughput, scaling and peak memory of each run.
+'''
+
+log_levels = ['debug','info','warning','error','critical']
+
+parser = argparse.ArgumentParser(description=desc)
+parser.add_argument('-sizes',        metavar='list',    dest='sizes',        required=False, type=str,   default='1k,10k,100k,1M,10M', help='Comma separated number of instances for each netlist (suffixes k and M are allowed).')
+parser.add_argument('-work_dir',     metavar='dir',     dest='work_dir',     required=False, type=str,   default='benchmark', help='Directory for the generated netlists and outputs.')
+parser.add_argument('-repeat',       metavar='N',       dest='repeat',       required=False, type=int,   default=1,    help='Number of runs for each size (the fastest is kept).')
+parser.add_argument('-sv2v_options', metavar='options', dest='sv2v_options', required=False, type=str,   default='',   help='Extra options passed to bsg_elab_to_rtl.py.')
+parser.add_argument('-module_size',  metavar='N',       dest='module_size',  required=False, type=parse_count, default=2000, help='Number of instances in each module.')
+parser.add_argument('-width',        metavar='N',       dest='width',        required=False, type=int,   default=32,   help='Width of the buses in each module.')
+parser.add_argument('-seed',         metavar='N',       dest='seed',         required=False, type=int,   default=0,    help='Seed for the netlist generator.')
+parser.add_argument('-json',         metavar='file',    dest='json',         required=False, type=str,                 help='Write the results to a JSON file.')
+parser.add_argument('-baseline',     metavar='file',    dest='baseline',     required=False, type=str,                 help='Compare against the JSON results from an earlier run.')
+parser.add_argument('-tolerance',    metavar='F',       dest='tolerance',    required=False, type=float, default=0.1,  help='Allowed slowdown or memory growth over the baseline.')
+parser.add_argument('-loglvl', choices=log_levels, default='info', dest='log_level', required=False, type=str, help='Set the logging level')
+
+args = parser.parse_args()
+
+logging.basicConfig(format='%(levelname)s: %(message)s', level=getattr(logging, args.log_level.upper()))
+
+args.sizes        = [parse_count(s) for s in args.sizes.split(',') if s]
+args.sv2v_options = shlex.split(args.sv2v_options)
+
+# The generated netlist has no compiler directives, so it is only preprocessed
+# with iverilog (the only tool needed outside of python) when -no_netlist_ir is
+# given without -stream. If it is missing, stream the netlist instead.
+options = set(args.sv2v_options)
+if not shutil.which('iverilog') and '-no_netlist_ir' in options and not options & {'-stream', '-incremental'}:
+  logging.warning('iverilog not found, adding -stream to the conversion options.')
+  args.sv2v_options.append('-stream')
+
+os.makedirs(args.work_dir, exist_ok=True)
+
+### Run the benchmarks
+
+results = []
+for instances in args.sizes:
+  results.append( run_benchmark( instances, args ) )
+
+report( results )
+
+if args.json:
+  with open(args.json, 'w') as fid:
+    json.dump({ 'argv' : sys.argv, 'sv2v_options' : args.sv2v_options, 'results' : results }, fid, indent=2)
+  logging.info('Wrote results to: %s', args.json)
+
+### Compare against the baseline
+
+if args.baseline:
+  with open(args.baseline, 'r') as fid:
+    regressions = compare_baseline( results, json.load(fid), args.tolerance )
+  if regressions:
+    logging.error('Found %d performance regressions!', regressions)
+    sys.exit(1)
+  logging.info('No performance regressions found.')
+
+logging.info('Finished!')
+sys.exit()
@@ -0,0 +1,104 @@
+'''
+bsg_cell_registry.py
+
+This file contains the registry of replacement functions used by the swap. Every
+function in bsg_gtech_modules.py, bsg_synthetic_modules.py and
+bsg_generic_modules.py is registered under the name of the cell it replaces
+along with its kind (GTECH, SYNTHETIC or GENERIC). Extra libraries of
+replacement functions (for example for technology hard macros) can be loaded
+from a python file or a directory of python files without changing this repo.
+
+The module name of an instance is normalized (stripping the '*' and '\\'
+characters of names like \\**SEQGEN**) once for each distinct module name, so
+finding the replacement for an instance is a single dict lookup.
+'''
+
+import os
+import glob
+import inspect
+import logging
+import importlib.util
+
+import bsg_gtech_modules
+import bsg_synthetic_modules
+import bsg_generic_modules
+
+# Kinds of replacements, in the same order as the swap counts
+CELL_KINDS = ('GTECH', 'SYNTHETIC', 'GENERIC')
+
+# Normalized cell name -> (kind, function) for every replacement
+__cells = dict()
+
+# Module name as written in the netlist -> (normalized name, kind, function,
+# whether the function takes the declaration tables). Kind and function are
+# None for modules with no replacement.
+__lookups = dict()
+
+# Paths of every library loaded with load_cell_library(...)
+__library_files = []
+
+# register_cell_library( module, kind )
+#
+# Register every function in the imported module as the replacement for the
+# cell of the same name. Functions that begin with _ are utility functions and
+# are skipped. A later registration of the same cell replaces the earlier one.
+# GENERIC replacements are called with ( instance, wires, regs, assigns ), all
+# others are called with ( instance ).
+#
+def register_cell_library( module, kind ):
+  assert kind in CELL_KINDS
+  for name, func in inspect.getmembers( module, inspect.isfunction ):
+    if name.startswith('_'):
+      continue
+    if name in __cells:
+      logging.info('Overriding %s replacement for %s with %s', CELL_KINDS[__cells[name][0]], name, module.__name__)
+    __cells[name] = (CELL_KINDS.index(kind), func)
+  __lookups.clear()
+
+# load_cell_library( path )
+#
+# Load a python file (or every python file in a directory) of replacement
+# functions and register them. A library can set CELL_KIND to 'GTECH',
+# 'SYNTHETIC' or 'GENERIC' to pick how its functions are called and counted
+# (defaults to 'GENERIC').
+#
+def load_cell_library( path ):
+  if os.path.isdir(path):
+    files = sorted(glob.glob(os.path.join(path, '*.py')))
+  else:
+    files = [path]
+  for f in files:
+    name = 'bsg_cell_library_%d' % len(__library_files)
+    spec = importlib.util.spec_from_file_location(name, f)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    kind = getattr(module, 'CELL_KIND', 'GENERIC')
+    logging.info('Loaded %s replacement library: %s', kind, f)
+    register_cell_library( module, kind )
+    __library_files.append(os.path.abspath(f))
+
+# cell_library_files()
+#
+# Paths of every library loaded with load_cell_library(...).
+#
+def cell_library_files():
+  return list(__library_files)
+
+# lookup_cell( module )
+#
+# Find the replacement for an instance of the given module name. Returns a
+# tuple of the normalized name, the kind (index into CELL_KINDS), the
+# replacement function and whether it takes the declaration tables. The kind
+# and function are None if there is no replacement.
+#
+def lookup_cell( module ):
+  entry = __lookups.get(module)
+  if entry is None:
+    name = module.replace('*','').replace('\\','')
+    kind, func = __cells.get(name, (None, None))
+    entry = __lookups[module] = (name, kind, func, kind == CELL_KINDS.index('GENERIC'))
+  return entry
+
+register_cell_library( bsg_gtech_modules, 'GTECH' )
+register_cell_library( bsg_synthetic_modules, 'SYNTHETIC' )
+register_cell_library( bsg_generic_modules, 'GENERIC' )
@@ -0,0 +1,159 @@
+'''
+bsg_convert_module.py
+
+This file contains the functions used to convert module definitions from the
+elaborated netlist back into RTL one at a time. Every ModuleDef in a
+DesignCompiler "write_file -hier" netlist is independent of the others,
+therefore the swap, optimization and codegen steps can be farmed out to a pool
+of worker processes and the resulting text stitched back together in the
+original module order.
+'''
+
+import io
+import time
+import logging
+import collections
+import multiprocessing
+
+from pyverilog.vparser.ast import *
+
+from bsg_ast_pass_manager import ast_convert_inplace
+
+from bsg_verilog_emitter import emit_verilog
+
+from bsg_netlist_stream import parse_module_span
+
+from bsg_netlist_ir import read_module_span
+
+from bsg_parse_cache import cache_key, cache_load, cache_store
+
+from bsg_profile import profile_step
+
+# Module definitions handed to the worker pool. This is set right before the
+# pool is forked so the workers inherit the parsed AST instead of having every
+# module pickled and sent down a pipe.
+__pool_definitions = None
+
+# convert_module( node, options )
+#
+# Convert a single definition from the elaborated netlist into RTL. The node is
+# placed into a small Source/Description of its own so that every pass
+# (including the wrapper pass which needs a parent to add the new module to)
+# behaves exactly as it would on the whole AST. Returns the generated verilog
+# text for the definition, the (gtech, synth, generic) swap counts and the text
+# for the wrapper module if one was added ('' otherwise). The wrapper text is
+# kept apart so the caller can write it at the front of the file, the same as
+# when the whole AST is converted at once.
+#
+def convert_module( node, options ):
+
+  ast = Source('', Description((node,)))
+
+  counts = ast_convert_inplace( ast, options )
+
+  start       = time.perf_counter()
+  definitions = ast.description.definitions
+  text        = io.StringIO()
+  wrapper     = io.StringIO()
+  emit_verilog( Description(definitions[-1:]), text )
+  emit_verilog( Description(definitions[:-1]), wrapper )
+  profile_step( 'codegen', time.perf_counter() - start )
+
+  return (text.getvalue(), counts, wrapper.getvalue())
+
+# convert_modules_parallel( ast, options, jobs )
+#
+# Convert every definition in the AST using a pool of jobs worker processes.
+# This is a generator that yields the (text, counts, wrapper) tuple from
+# convert_module(...) for each definition in the same order the definitions
+# appear in the AST so the caller can write them out as they arrive.
+#
+def convert_modules_parallel( ast, options, jobs ):
+
+  global __pool_definitions
+  __pool_definitions = ast.description.definitions
+
+  count     = len(__pool_definitions)
+  chunksize = max(1, count // (jobs * 16))
+
+  logging.info('Converting %d modules using %d jobs.', count, jobs)
+
+  ctx = multiprocessing.get_context('fork')
+  with ctx.Pool(jobs) as pool:
+    for result in pool.imap(__convert_module_worker, [(i, options) for i in range(count)], chunksize):
+      yield result
+
+  __pool_definitions = None
+
+# __convert_module_worker( task )
+#
+# Worker process entry point. The task is an index into the definitions that
+# were inherited from the parent process and the conversion options.
+#
+def __convert_module_worker( task ):
+  index, options = task
+  return convert_module( __pool_definitions[index], options )
+
+# convert_module_spans( spans, options, jobs )
+#
+# Streaming version of convert_modules_parallel(...). Takes an iterable of
+# (lineno, text) module spans (see bsg_netlist_stream.py) and parses, converts
+# and yields the (text, counts, wrapper) tuple for each span in order. Only a
+# bounded window of spans is in flight at any time so memory does not grow with
+# the size of the design. When jobs is greater than 1, the parsing is also done
+# in the worker processes.
+#
+def convert_module_spans( spans, options, jobs ):
+
+  if jobs <= 1:
+    for lineno, text in spans:
+      yield __convert_span_worker( (lineno, text, options) )
+    return
+
+  logging.info('Streaming modules using %d jobs.', jobs)
+
+  ctx = multiprocessing.get_context('fork')
+  with ctx.Pool(jobs) as pool:
+    pending = collections.deque()
+    for lineno, text in spans:
+      pending.append(pool.apply_async(__convert_span_worker, ((lineno, text, options),)))
+      if len(pending) >= 2*jobs:
+        yield pending.popleft().get()
+    while pending:
+      yield pending.popleft().get()
+
+# __convert_span_worker( task )
+#
+# Parse and convert a single module span. The task is the line number and text
+# of the span and the conversion options. If a cache directory is given, the
+# parsed AST for the span is looked up there before parsing. Unless disabled,
+# the instances are read into a CellTable (see bsg_netlist_ir.py) instead of
+# being parsed by pyverilog.
+#
+def __convert_span_worker( task ):
+  lineno, text, options = task
+
+  definitions = None
+  if options.cache_dir:
+    key = cache_key( 'span_ir' if options.netlist_ir else 'span', lineno, text )
+    definitions = cache_load( options.cache_dir, key )
+
+  if definitions is None:
+    start = time.perf_counter()
+    if options.netlist_ir:
+      definitions = read_module_span( lineno, text )
+    else:
+      definitions = parse_module_span( lineno, text )
+    profile_step( 'parse', time.perf_counter() - start )
+    if options.cache_dir:
+      cache_store( options.cache_dir, key, definitions )
+
+  texts    = []
+  wrappers = []
+  counts   = [0, 0, 0]
+  for node in definitions:
+    t, c, w = convert_module( node, options )
+    texts.append(t)
+    wrappers.append(w)
+    counts = [a+b for a,b in zip(counts, c)]
+  return (''.join(texts), tuple(counts), ''.join(wrappers))
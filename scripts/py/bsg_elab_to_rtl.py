@@ -1,8 +1,17 @@
 '''
 usage: bsg_elab_to_rtl.py [-h] -i file -o file
                           [-loglvl {debug,info,warning,error,critical}]
+                          [-async_log]
+                          [-no_reg_bus_opt]
                           [-no_wire_reg_decl_opt] [-no_always_at_redux_opt]
-                          [-no_concat_redux_opt]
+                          [-no_dead_net_opt] [-no_net_inline_opt]
+                          [-no_assign_redux_opt]
+                          [-no_concat_redux_opt] [-wrapper name]
+                          [-design_name name] [-jobs N] [-stream]
+                          [-cache_dir dir] [-cache_max_mb N]
+                          [-incremental dir] [-no_lineno] [-no_netlist_ir]
+                          [-profile file] [-profile_pstats file]
+                          [-cell_lib path]
 
 This script takes an elaborated netlest from Synopsys DesignCompiler and
 converts it back into a RTL verilog netlist.
@@ -13,31 +22,106 @@ optional arguments:
   -o file               Output file
   -loglvl {debug,info,warning,error,critical}
                         Set the logging level
+  -async_log            Write the log from a background thread.
+  -no_reg_bus_opt       Prevent the multi-bit register reconstruction pass.
   -no_wire_reg_decl_opt
                         Prevent the wire and reg declaration optimization
                         pass.
   -no_always_at_redux_opt
                         Prevent the always@ reduction optimization pass.
+  -no_dead_net_opt      Prevent the dead net elimination optimization pass.
+  -no_net_inline_opt    Prevent the single reader net inlining optimization
+                        pass.
+  -no_assign_redux_opt  Prevent the continuous assign reduction optimization
+                        pass.
   -no_concat_redux_opt  Prevent the concatination reduction optimization pass.
+  -wrapper name         Toplevel Wrapper Name
+  -design_name name     Name of the toplevel module to wrap (defaults to the
+                        DESIGN_NAME environment variable).
+  -jobs N               Number of worker processes used to convert modules.
+  -stream               Parse and convert the input one module at a time.
+  -cache_dir dir        Directory used to cache parsed ASTs between runs.
+  -cache_max_mb N       Maximum size of the parsed AST cache in megabytes.
+  -incremental dir      Directory used to reuse converted modules between runs.
+  -no_lineno            Drop the line numbers from the AST after parsing to
+                        save memory.
+  -no_netlist_ir        Parse the instances with pyverilog instead of reading
+                        them into compact cell tables. Netlists with compiler
+                        directives are always parsed with pyverilog.
+  -profile file         Write a JSON report of the time and peak memory of each
+                        step, module and cell type.
+  -profile_pstats file  Also profile the run with cProfile and dump the stats.
+  -cell_lib path        Python file (or directory of python files) with extra
+                        cell replacement functions. May be given more than
+                        once.
 '''
 
+import os
 import sys
+import time
+import shutil
 import argparse
 import logging
 
 from pyverilog.vparser import parser as vparser
-from pyverilog.ast_code_generator.codegen import ASTCodeGenerator
 
-from bsg_ast_walk_and_swap_inplace import ast_walk_and_swap_inplace 
+from bsg_ast_pass_manager import ast_convert_inplace
+
+from bsg_convert_module import convert_modules_parallel
+from bsg_convert_module import convert_module_spans
+
+from bsg_netlist_stream import iter_module_spans
+
+from bsg_netlist_ir import read_netlist, has_directives
+
+from bsg_parse_cache import cache_key, file_digest, cache_load, cache_store, cache_evict
+
+from bsg_incremental import incremental_module_spans
+
+from bsg_verilog_emitter import emit_verilog
+
+from bsg_ast_visitor import ast_drop_lineno_inplace
+
+from bsg_log_writer import start_log_writer
+
+from bsg_profile import profile_start, profile_step
 
-from bsg_ast_wire_reg_decl_opt_inplace import ast_wire_reg_decl_opt_inplace
-from bsg_ast_always_at_redux_opt_inplace import ast_always_at_redux_opt_inplace
-from bsg_ast_concat_redux_opt_inplace import ast_concat_redux_opt_inplace
+from bsg_cell_registry import load_cell_library
 
-from bsg_ast_add_wrapper_inplace import ast_add_wrapper_inplace
+# Log the total number of replacements and the percentage of each kind
+def log_swap_counts( gtech, synth, generics ):
+  total = gtech + synth + generics
+  if total == 0:
+    logging.info('No GTECH, SYNTHETIC, or GENERICS instances found!')
+  else:
+    logging.info('Total Number of Replacements = %d', total)
+    logging.info("\t GTECH swap Count: %d (%d%%)", gtech, (gtech/total)*100)
+    logging.info("\t SYNTHETIC swap Count: %d (%d%%)", synth, (synth/total)*100)
+    logging.info("\t GENERICS swap Count: %d (%d%%)", generics, (generics/total)*100)
 
-# Update recursion depth (default 1000)
-sys.setrecursionlimit(1500)
+# Write the (text, counts, wrapper) results from converting each module to the
+# output file as they arrive and log the total swap counts. When a wrapper is
+# requested, the modules are written to a temporary file first so that the
+# wrapper module can be put at the front of the output, the same as when the
+# whole AST is converted at once.
+def write_converted_modules( results, outfile, wrapper=None ):
+  gtech = synth = generics = 0
+  wrappers = []
+  logging.info('Writing RTL to output file: %s', outfile)
+  body = outfile + '.tmp' if wrapper else outfile
+  with open(body, 'w') as fid:
+    for text, (g, s, n), w in results:
+      fid.write( text )
+      wrappers.append( w )
+      gtech    += g
+      synth    += s
+      generics += n
+  if wrapper:
+    with open(outfile, 'w') as fid, open(body, 'r') as body_fid:
+      fid.write( ''.join(wrappers) )
+      shutil.copyfileobj( body_fid, fid )
+    os.remove(body)
+  log_swap_counts( gtech, synth, generics )
 
 ### Setup the argument parsing
 
@@ -52,74 +136,186 @@ parser = argparse.ArgumentParser(description=desc)
 parser.add_argument('-i',      metavar='file',                     dest='infile',    required=True,  type=str, help='Input file')
 parser.add_argument('-o',      metavar='file',                     dest='outfile',   required=True,  type=str, help='Output file')
 parser.add_argument('-loglvl', choices=log_levels, default='info', dest='log_level', required=False, type=str, help='Set the logging level')
+parser.add_argument('-async_log', dest='async_log', action='store_true', help='Write the log from a background thread.')
 
-parser.add_argument('-wrapper', metavar='name', dest='wrapper', required=False, type=str, help='Toplevel Wrapper Name')
+parser.add_argument('-wrapper',     metavar='name', dest='wrapper',     required=False, type=str, help='Toplevel Wrapper Name')
+parser.add_argument('-design_name', metavar='name', dest='design_name', required=False, type=str, help='Name of the toplevel module to wrap (defaults to the DESIGN_NAME environment variable).')
 
 # Turn on/off optimization passes
+parser.add_argument('-no_reg_bus_opt',         dest='reg_bus_opt',         action='store_false', help='Prevent the multi-bit register reconstruction pass.')
 parser.add_argument('-no_wire_reg_decl_opt',   dest='wire_reg_decl_opt',   action='store_false', help='Prevent the wire and reg declaration optimization pass.')
 parser.add_argument('-no_always_at_redux_opt', dest='always_at_redux_opt', action='store_false', help='Prevent the always@ reduction optimization pass.')
+parser.add_argument('-no_dead_net_opt',        dest='dead_net_opt',        action='store_false', help='Prevent the dead net elimination optimization pass.')
+parser.add_argument('-no_net_inline_opt',      dest='net_inline_opt',      action='store_false', help='Prevent the single reader net inlining optimization pass.')
+parser.add_argument('-no_assign_redux_opt',    dest='assign_redux_opt',    action='store_false', help='Prevent the continuous assign reduction optimization pass.')
 parser.add_argument('-no_concat_redux_opt',    dest='concat_redux_opt',    action='store_false', help='Prevent the concatination reduction optimization pass.')
 
+# Parallel conversion
+parser.add_argument('-jobs', metavar='N', dest='jobs', required=False, type=int, default=1, help='Number of worker processes used to convert modules.')
+
+# Streaming conversion
+parser.add_argument('-stream', dest='stream', action='store_true', help='Parse and convert the input one module at a time.')
+
+# Parsed AST cache
+parser.add_argument('-cache_dir',    metavar='dir', dest='cache_dir',    required=False, type=str,              help='Directory used to cache parsed ASTs between runs.')
+parser.add_argument('-cache_max_mb', metavar='N',   dest='cache_max_mb', required=False, type=int, default=4096, help='Maximum size of the parsed AST cache in megabytes.')
+
+# Incremental reconversion (implies -stream)
+parser.add_argument('-incremental', metavar='dir', dest='incremental', required=False, type=str, help='Directory used to reuse converted modules between runs.')
+
+# Read the instances into compact cell tables rather than parsing them
+parser.add_argument('-no_netlist_ir', dest='netlist_ir', action='store_false', help='Parse the instances with pyverilog instead of reading them into compact cell tables.')
+
+# Drop line numbers after parsing
+parser.add_argument('-no_lineno', dest='lineno', action='store_false', help='Drop the line numbers from the AST after parsing to save memory.')
+
+# Profiling
+parser.add_argument('-profile',        metavar='file', dest='profile',        required=False, type=str, help='Write a JSON report of the time and peak memory of each step, module and cell type.')
+parser.add_argument('-profile_pstats', metavar='file', dest='profile_pstats', required=False, type=str, help='Also profile the run with cProfile and dump the stats.')
+
+# Extra cell replacement libraries
+parser.add_argument('-cell_lib', metavar='path', dest='cell_libs', required=False, type=str, action='append', default=[], help='Python file (or directory of python files) with extra cell replacement functions. May be given more than once.')
+
 args = parser.parse_args()
 
 ### Configure the logger
 
-if   args.log_level == 'debug':    logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.DEBUG)
-elif args.log_level == 'info':     logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.INFO)
-elif args.log_level == 'warning':  logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.WARNING)
-elif args.log_level == 'error':    logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.ERROR)
-elif args.log_level == 'critical': logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.CRITICAL)
+if   args.log_level == 'debug':    log_level = logging.DEBUG
+elif args.log_level == 'info':     log_level = logging.INFO
+elif args.log_level == 'warning':  log_level = logging.WARNING
+elif args.log_level == 'error':    log_level = logging.ERROR
+elif args.log_level == 'critical': log_level = logging.CRITICAL
+
+if args.async_log:
+  start_log_writer( log_level, '%(levelname)s: %(message)s' )
+else:
+  logging.basicConfig(format='%(levelname)s: %(message)s', level=log_level)
+
+### Start profiling
+
+# The report is written when the script exits (see bsg_profile.py). Worker
+# processes don't report back, so with -jobs greater than 1 only the steps run
+# in this process are recorded.
+if args.profile:
+  profile_start( args.profile, args.profile_pstats )
+  if args.jobs > 1:
+    logging.warning('Per-step, per-module and per-cell profile data is not collected from worker processes.')
+elif args.profile_pstats:
+  logging.warning('-profile_pstats requires -profile. Skipping!')
+
+### Load the extra cell replacement libraries
+
+# This happens before any worker process is started so that every worker sees
+# the same replacements (see bsg_cell_registry.py).
+for path in args.cell_libs:
+  load_cell_library( path )
+
+### Stream the input file one module at a time
+
+# Rather than building a single AST for the whole netlist, each module is
+# parsed, converted, written and freed in turn so that memory is bounded by the
+# largest module in the design.
+#
+# In incremental mode, modules whose text has not changed since the last run
+# reuse the converted text from that run rather than being converted again.
+if args.stream or args.incremental:
+
+  logging.info('Streaming modules from input file: %s', args.infile)
+  with open(args.infile, 'r') as fid:
+    if args.incremental:
+      results = incremental_module_spans( iter_module_spans( fid ), args, args.jobs, args.incremental )
+    else:
+      results = convert_module_spans( iter_module_spans( fid ), args, args.jobs )
+    write_converted_modules( results, args.outfile, args.wrapper )
+
+  if args.cache_dir:
+    cache_evict( args.cache_dir, args.cache_max_mb*1024*1024 )
+
+  logging.info('Finished!')
+  sys.exit()
 
 ### Parse the input file
 
-logging.info('Parsing file input file: %s' % args.infile)
-ast, directives = vparser.parse([args.infile])
+# If a cache directory is given, the AST for an unchanged input file is loaded
+# from the cache instead of being parsed again. Unless -no_netlist_ir is given,
+# the instances are read into compact cell tables (see bsg_netlist_ir.py) and
+# the netlist is not preprocessed. A netlist with compiler directives still
+# needs the preprocessor, so it is always parsed with pyverilog.
+start = time.perf_counter()
 
-### Walk the AST and replace DesignCompiler constructs with RTL
+if args.netlist_ir and has_directives( args.infile ):
+  logging.info('Compiler directives found in the input file, parsing it with pyverilog.')
+  args.netlist_ir = False
 
-logging.info('Performing AST replacements.')
-(gtech, synth, generics) = ast_walk_and_swap_inplace( ast )
-total = gtech + synth + generics
-if total == 0:
-  logging.info('No GTECH, SYNTHETIC, or GENERICS instances found!')
-else:
-  logging.info('Total Number of Replacements = %d' % total)
-  logging.info("\t GTECH swap Count: %d (%d%%)" % (gtech, (gtech/total)*100))
-  logging.info("\t SYNTHETIC swap Count: %d (%d%%)" % (synth, (synth/total)*100))
-  logging.info("\t GENERICS swap Count: %d (%d%%)" % (generics, (generics/total)*100))
+ast = None
+if args.cache_dir:
+  key = cache_key( 'file_ir' if args.netlist_ir else 'file', file_digest( args.infile ) )
+  ast = cache_load( args.cache_dir, key )
+  if ast is not None:
+    logging.info('Loaded cached AST for input file: %s', args.infile)
 
-### Perform various optimization passes
+if ast is None:
+  logging.info('Parsing file input file: %s', args.infile)
+  if args.netlist_ir:
+    with open(args.infile, 'r') as fid:
+      ast = read_netlist( fid )
+  else:
+    ast, directives = vparser.parse([args.infile])
+  if args.cache_dir:
+    cache_store( args.cache_dir, key, ast )
+    cache_evict( args.cache_dir, args.cache_max_mb*1024*1024 )
 
-# Wire / Reg Declartion Optimization
-if args.wire_reg_decl_opt:
-  logging.info('Performing wire/reg declartion optimizations.')
-  ast_wire_reg_decl_opt_inplace( ast )
-else:
-  logging.info('Wire/reg declartion optimizations have been disabled.')
+# The line numbers are only kept for debugging, the output does not depend on
+# them. The cached AST always keeps them.
+if not args.lineno:
+  logging.info('Dropping line numbers from the AST.')
+  ast_drop_lineno_inplace( ast )
 
-# Always@ Reduction Optimization
-if args.always_at_redux_opt:
-  logging.info('Performing always@ reduction optimizations.')
-  ast_always_at_redux_opt_inplace( ast )
-else:
-  logging.info('Always@ reduction optimizations have been disabled.')
+profile_step( 'parse', time.perf_counter() - start )
 
-# Concatination Reduction Optimization
-if args.concat_redux_opt:
-  logging.info('Performing concatination reduction optimizations.')
-  ast_concat_redux_opt_inplace( ast )
-else:
+### Convert modules in parallel
+
+# Every module definition is independent so the swap, optimization passes and
+# codegen are done per module in a pool of workers. The output text is written
+# in the original module order as the results come back.
+if args.jobs > 1:
+
+  write_converted_modules( convert_modules_parallel( ast, args, args.jobs ), args.outfile, args.wrapper )
+
+  logging.info('Finished!')
+  sys.exit()
+
+### Walk the AST, replace DesignCompiler constructs with RTL and perform
+### various optimization passes
+
+# Every enabled pass is run on each module in turn (see bsg_ast_pass_manager.py)
+# rather than walking the whole AST once per pass.
+if not args.reg_bus_opt:
+  logging.info('Register bus optimizations have been disabled.')
+if not args.wire_reg_decl_opt:
+  logging.info('Wire/reg declartion optimizations have been disabled.')
+if not args.always_at_redux_opt:
+  logging.info('Always@ reduction optimizations have been disabled.')
+if not args.dead_net_opt:
+  logging.info('Dead net elimination optimizations have been disabled.')
+if not args.net_inline_opt:
+  logging.info('Net inlining optimizations have been disabled.')
+if not args.assign_redux_opt:
+  logging.info('Continuous assign reduction optimizations have been disabled.')
+if not args.concat_redux_opt:
   logging.info('Concatination reduction optimizations have been disabled.')
 
-# Add toplevel wrapper
-if args.wrapper:
-  ast_add_wrapper_inplace( ast, None, args.wrapper )
+logging.info('Performing AST replacements and optimizations.')
+(gtech, synth, generics) = ast_convert_inplace( ast, args )
+log_swap_counts( gtech, synth, generics )
 
 ### Output RTL
 
-logging.info('Writing RTL to output file: %s' % args.outfile)
+logging.info('Writing RTL to output file: %s', args.outfile)
+start = time.perf_counter()
 with open(args.outfile, 'w') as fid:
-  fid.write( ASTCodeGenerator().visit( ast ) )
+  emit_verilog( ast, fid )
+profile_step( 'codegen', time.perf_counter() - start )
   
 ### Finish
 
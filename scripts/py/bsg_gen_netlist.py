@@ -0,0 +1,329 @@
+'''
+usage: bsg_gen_netlist.py [-h] -o file [-instances N] [-module_size N]
+                          [-width N] [-seqgen W] [-gtech W] [-synthetic W]
+                          [-concat W] [-seed N] [-top name]
+                          [-loglvl {debug,info,warning,error,critical}]
+
+This script writes a synthetic netlist in the same style as the elaborated
+netlists written by Synopsys DesignCompiler. It is used to test and benchmark
+the conversion without DesignCompiler or a design to elaborate.
+
+optional arguments:
+  -h, --help            show this help message and exit
+  -o file               Output file
+  -instances N          Number of instances (suffixes k and M are allowed).
+  -module_size N        Number of instances in each module.
+  -width N              Width of the buses in each module.
+  -seqgen W             Relative weight of SEQGEN cells.
+  -gtech W              Relative weight of GTECH gates.
+  -synthetic W          Relative weight of synthetic *_OP modules.
+  -concat W             Relative weight of bit-blasted concat assigns.
+  -seed N               Seed for the random number generator.
+  -top name             Name of the toplevel module.
+  -loglvl {debug,info,warning,error,critical}
+                        Set the logging level
+
+The netlist is random but the same seed and options always write the same
+file. Every cell in it has a replacement in bsg_generic_modules.py,
+bsg_gtech_modules.py or bsg_synthetic_modules.py. The instances are split
+across leaf modules of -module_size instances each, plus a toplevel module that
+instantiates every leaf module once. The instances in a leaf module are the
+SEQGEN cells (one per register bit, in a mix of configurations), GTECH gates,
+synthetic *_OP modules and bit-blasted concat assigns in proportion to their
+weights.
+'''
+
+import sys
+import random
+import logging
+import argparse
+import collections
+
+# SEQGEN configurations as the pins that are not tied low. The data pin is
+# given as None and every other pin is tied to 1'b0.
+__seqgen_configs = ( # flop
+                     { 'clocked_on' : 'clk_i', 'next_state' : None, 'synch_enable' : '1\'b1' }
+                   , # flop with sync reset and enable
+                     { 'clocked_on' : 'clk_i', 'next_state' : None, 'synch_clear' : 'reset_i', 'synch_enable' : 'en_i' }
+                   , # flop with async reset
+                     { 'clocked_on' : 'clk_i', 'next_state' : None, 'clear' : 'reset_i', 'synch_enable' : '1\'b1' }
+                   , # flop with sync set
+                     { 'clocked_on' : 'clk_i', 'next_state' : None, 'synch_preset' : 'reset_i', 'synch_enable' : '1\'b1' }
+                   , # flop with async set and sync enable
+                     { 'clocked_on' : 'clk_i', 'next_state' : None, 'preset' : 'reset_i', 'synch_enable' : 'en_i' }
+                   , # latch
+                     { 'data_in' : None, 'enable' : 'en_i' } )
+
+# Every SEQGEN pin in the order DesignCompiler writes them
+__seqgen_pins = ( 'clear'
+                , 'preset'
+                , 'next_state'
+                , 'clocked_on'
+                , 'data_in'
+                , 'enable'
+                , 'Q'
+                , 'synch_clear'
+                , 'synch_preset'
+                , 'synch_toggle'
+                , 'synch_enable' )
+
+# GTECH gates and their input pins (the output pin is always Z)
+__gtech_gates = ( ('GTECH_AND2',  'AB')
+                , ('GTECH_OR2',   'AB')
+                , ('GTECH_NAND2', 'AB')
+                , ('GTECH_NOR2',  'AB')
+                , ('GTECH_XOR2',  'AB')
+                , ('GTECH_XNOR2', 'AB')
+                , ('GTECH_NOT',   'A')
+                , ('GTECH_BUF',   'A')
+                , ('GTECH_AND3',  'ABC')
+                , ('GTECH_OR3',   'ABC')
+                , ('GTECH_AO21',  'ABC')
+                , ('GTECH_OA21',  'ABC')
+                , ('GTECH_MUX2',  'ABS') )
+
+# Synthetic modules with a bus output and a single bit output
+__synthetic_bus_ops = ('ADD_UNS_OP', 'SUB_UNS_OP', 'MULT_UNS_OP', 'SELECT_OP')
+__synthetic_bit_ops = ('EQ_UNS_OP', 'LT_UNS_OP', 'GEQ_UNS_OP')
+
+# parse_count( text )
+#
+# Parse an instance count with an optional k (thousand) or M (million) suffix,
+# for example 10k or 1M.
+#
+def parse_count( text ):
+  scale = {'k': 10**3, 'K': 10**3, 'm': 10**6, 'M': 10**6}.get(text[-1:], 1)
+  if scale != 1:
+    text = text[:-1]
+  return int(float(text) * scale)
+
+# generate_netlist( fid, instances, module_size=2000, width=32, weights=(3,5,1,1), seed=0, top='bench_top' )
+#
+# Write a synthetic netlist with the given number of instances to the open
+# file. The weights are the relative amount of SEQGEN cells, GTECH gates,
+# synthetic modules and concat assigns. Returns a Counter with the number of
+# each kind of instance written.
+#
+def generate_netlist( fid, instances, module_size=2000, width=32, weights=(3,5,1,1), seed=0, top='bench_top' ):
+
+  rng    = random.Random(seed)
+  counts = collections.Counter()
+
+  modules = max(1, (instances + module_size - 1) // module_size)
+  names   = ['%s_m%d' % (top, i) for i in range(modules)]
+
+  for i,name in enumerate(names):
+    size = min(module_size, instances - i*module_size) if instances > i*module_size else 0
+    __write_leaf_module( fid, name, size, width, weights, rng, counts )
+
+  __write_top_module( fid, top, names, width )
+  counts['module'] += modules + 1
+
+  return counts
+
+# __write_leaf_module( fid, name, size, width, weights, rng, counts )
+#
+# Write a single leaf module with (about) size instances. To keep the netlist
+# free of combinational loops, the nets are built in order: the concat assigns
+# only read inputs and registers, the synthetic modules read inputs, registers,
+# concats and earlier synthetic modules, the gates can read any of these or an
+# earlier gate and the registers are fed from synthetic modules and gates.
+#
+def __write_leaf_module( fid, name, size, width, weights, rng, counts ):
+
+  total = float(sum(weights)) or 1.0
+  regs  = int(round(size * weights[0] / total / width))
+  ops   = int(round(size * weights[2] / total))
+  ccs   = int(round(size * weights[3] / total))
+  gates = max(0, size - regs*width - ops - ccs)
+
+  msb = width - 1
+  out = []
+
+  ### Ports and declarations
+
+  out.append('module %s ( clk_i, reset_i, en_i, a_i, b_i, y_o );' % name)
+  out.append('  input clk_i, reset_i, en_i;')
+  out.append('  input [%d:0] a_i;' % msb)
+  out.append('  input [%d:0] b_i;' % msb)
+  out.append('  output [%d:0] y_o;' % msb)
+
+  reg_buses = ['r%d' % i for i in range(regs)]
+  cc_buses  = ['w%d' % i for i in range(ccs)]
+  op_buses  = []
+  op_bits   = []
+  for i in range(ops):
+    if rng.random() < 0.75:
+      op_buses.append('s%d' % i)
+    else:
+      op_bits.append('c%d' % i)
+  gate_bits = ['N%d' % i for i in range(gates)]
+
+  for bus in reg_buses + cc_buses + op_buses:
+    out.append('  wire [%d:0] %s;' % (msb, bus))
+  for i in range(0, len(op_bits) + len(gate_bits), 64):
+    out.append('  wire %s;' % ', '.join((op_bits + gate_bits)[i:i+64]))
+
+  ### SEQGEN cells (one per register bit)
+
+  data_buses = op_buses or ['a_i']
+  for bus in reg_buses:
+    config = rng.choice(__seqgen_configs)
+    src    = rng.choice(data_buses) if rng.random() < 0.75 else None
+    for bit in range(msb, -1, -1):
+      data = '%s[%d]' % (src, bit) if src else (rng.choice(gate_bits) if gate_bits else 'b_i[%d]' % bit)
+      pins = []
+      for pin in __seqgen_pins:
+        if pin == 'Q':
+          value = '%s[%d]' % (bus, bit)
+        elif pin in config:
+          value = config[pin] or data
+        else:
+          value = '1\'b0'
+        pins.append('.%s(%s)' % (pin, value))
+      out.append('  \\**SEQGEN**  %s_reg_%d_ ( %s );' % (bus, bit, ', '.join(pins)))
+    counts['SEQGEN'] += width
+
+  ### Synthetic modules
+
+  sources = ['a_i', 'b_i'] + reg_buses + cc_buses
+  for i in range(ops):
+    if 's%d' % i in op_buses:
+      op = rng.choice(__synthetic_bus_ops)
+      z  = 's%d' % i
+    else:
+      op = rng.choice(__synthetic_bit_ops)
+      z  = 'c%d' % i
+    a = __bus_or_concat( rng.choice(sources), width, rng )
+    b = __bus_or_concat( rng.choice(sources), width, rng )
+    if op == 'SELECT_OP':
+      pins = '.DATA1(%s), .DATA2(%s), .CONTROL1(en_i), .CONTROL2(reset_i), .Z(%s)' % (a, b, z)
+    else:
+      pins = '.A(%s), .B(%s), .Z(%s)' % (a, b, z)
+    out.append('  %s C%d ( %s );' % (op, i, pins))
+    if z in op_buses:
+      sources.append(z)
+    counts[op] += 1
+
+  ### GTECH gates
+
+  pool = ['%s[%d]' % (bus, bit) for bus in sources for bit in range(width)] + op_bits
+  for i in range(gates):
+    gate, inputs = rng.choice(__gtech_gates)
+    pins = ['.%s(%s)' % (pin, rng.choice(pool)) for pin in inputs]
+    out.append('  %s G%d ( %s, .Z(N%d) );' % (gate, i, ', '.join(pins), i))
+    pool.append('N%d' % i)
+    counts[gate] += 1
+
+  ### Bit-blasted concat assigns (in pairs with a concat on the left, like the
+  ### assigns DesignCompiler writes for multi-output cells)
+
+  reads = ['a_i', 'b_i'] + reg_buses
+  for i in range(0, len(cc_buses), 2):
+    buses = cc_buses[i:i+2]
+    bits  = []
+    for bus in buses:
+      bits.extend(__concat_bits( reads, width, rng ))
+    lhs = buses[0] if len(buses) == 1 else '{ %s }' % ', '.join(buses)
+    out.append('  assign %s = { %s };' % (lhs, ', '.join(bits)))
+    counts['concat'] += len(buses)
+
+  out.append('  assign y_o = { %s };' % ', '.join([rng.choice(pool) for bit in range(width)]))
+  out.append('endmodule')
+  out.append('')
+  out.append('')
+
+  fid.write('\n'.join(out))
+
+# __write_top_module( fid, top, names, width )
+#
+# Write the toplevel module that instantiates every leaf module once.
+#
+def __write_top_module( fid, top, names, width ):
+
+  msb = width - 1
+  out = []
+
+  out.append('module %s ( clk_i, reset_i, en_i, a_i, b_i, y_o );' % top)
+  out.append('  input clk_i, reset_i, en_i;')
+  out.append('  input [%d:0] a_i;' % msb)
+  out.append('  input [%d:0] b_i;' % msb)
+  out.append('  output [%d:0] y_o;' % msb)
+  for i in range(0, len(names)):
+    out.append('  wire [%d:0] y%d;' % (msb, i))
+  for i,name in enumerate(names):
+    out.append('  %s u%d ( .clk_i(clk_i), .reset_i(reset_i), .en_i(en_i), .a_i(a_i), .b_i(b_i), .y_o(y%d) );' % (name, i, i))
+  out.append('  assign y_o = y%d;' % (len(names) - 1))
+  out.append('endmodule')
+  out.append('')
+
+  fid.write('\n'.join(out))
+
+# __bus_or_concat( bus, width, rng )
+#
+# Connect a bus to a port either by name or, like DesignCompiler often does, as
+# a concat with every bit listed from MSB to LSB.
+#
+def __bus_or_concat( bus, width, rng ):
+  if rng.random() < 0.5:
+    return bus
+  return '{ %s }' % ', '.join(['%s[%d]' % (bus, bit) for bit in range(width-1, -1, -1)])
+
+# __concat_bits( buses, width, rng )
+#
+# Return the bits of a bit-blasted concat of the given width. The bits are made
+# from runs of consecutive bits of the buses (MSB to LSB) and runs of 1'b0.
+#
+def __concat_bits( buses, width, rng ):
+  bits = []
+  while len(bits) < width:
+    length = rng.randint(1, width - len(bits))
+    if rng.random() < 0.2:
+      bits.extend(['1\'b0'] * length)
+    else:
+      bus   = rng.choice(buses)
+      start = rng.randint(length-1, width-1)
+      bits.extend(['%s[%d]' % (bus, bit) for bit in range(start, start-length, -1)])
+  return bits
+
+if __name__ == '__main__':
+
+  ### Setup the argument parsing
+
+  desc = '''
+  This script writes a synthetic netlist in the same style as the elaborated
+  netlists written by Synopsys DesignCompiler.
+  '''
+
+  log_levels = ['debug','info','warning','error','critical']
+
+  parser = argparse.ArgumentParser(description=desc)
+  parser.add_argument('-o',           metavar='file', dest='outfile',     required=True,  type=str,                  help='Output file')
+  parser.add_argument('-instances',   metavar='N',    dest='instances',   required=False, type=parse_count, default=10000, help='Number of instances (suffixes k and M are allowed).')
+  parser.add_argument('-module_size', metavar='N',    dest='module_size', required=False, type=parse_count, default=2000,  help='Number of instances in each module.')
+  parser.add_argument('-width',       metavar='N',    dest='width',       required=False, type=int,   default=32,    help='Width of the buses in each module.')
+  parser.add_argument('-seqgen',      metavar='W',    dest='seqgen',      required=False, type=float, default=3,     help='Relative weight of SEQGEN cells.')
+  parser.add_argument('-gtech',       metavar='W',    dest='gtech',       required=False, type=float, default=5,     help='Relative weight of GTECH gates.')
+  parser.add_argument('-synthetic',   metavar='W',    dest='synthetic',   required=False, type=float, default=1,     help='Relative weight of synthetic *_OP modules.')
+  parser.add_argument('-concat',      metavar='W',    dest='concat',      required=False, type=float, default=1,     help='Relative weight of bit-blasted concat assigns.')
+  parser.add_argument('-seed',        metavar='N',    dest='seed',        required=False, type=int,   default=0,     help='Seed for the random number generator.')
+  parser.add_argument('-top',         metavar='name', dest='top',         required=False, type=str,   default='bench_top', help='Name of the toplevel module.')
+  parser.add_argument('-loglvl', choices=log_levels, default='info', dest='log_level', required=False, type=str, help='Set the logging level')
+
+  args = parser.parse_args()
+
+  logging.basicConfig(format='%(levelname)s: %(message)s', level=getattr(logging, args.log_level.upper()))
+
+  ### Write the netlist
+
+  logging.info('Writing %d instances to: %s', args.instances, args.outfile)
+  with open(args.outfile, 'w') as fid:
+    counts = generate_netlist( fid, args.instances, args.module_size, args.width
+                             , (args.seqgen, args.gtech, args.synthetic, args.concat)
+                             , args.seed, args.top )
+
+  for kind, count in sorted(counts.items()):
+    logging.info('\t %s: %d', kind, count)
+
+  logging.info('Finished!')
+  sys.exit()
@@ -14,41 +14,169 @@ import logging
 from pyverilog.vparser.ast import *
 from bsg_utility_funcs import __get_instance_ports
 
+# SEQGEN configuration pins. Bit i of the configuration bitmask is set when
+# pin i is not tied low.
+__seqgen_config_pins = ( 'clocked_on'
+                       , 'clear'
+                       , 'preset'
+                       , 'enable'
+                       , 'data_in'
+                       , 'synch_clear'
+                       , 'synch_preset'
+                       , 'synch_enable'
+                       , 'next_state'
+                       , 'synch_toggle' )
+
+# Bits of the configuration bitmask for the output pins
+__seqgen_q_bit  = 1 << len(__seqgen_config_pins)
+__seqgen_qn_bit = 1 << (len(__seqgen_config_pins)+1)
+
+# Cache of the always block shape for each SEQGEN configuration bitmask
+__seqgen_shapes = dict()
+
 # generic sequential cell
 def SEQGEN( instance, wires, regs, assigns ):
 
   p = __get_instance_ports(instance)
 
+  # Reduce the configuration to a bitmask with cheap tie-off checks and look up
+  # the always block shape for it (only worked out once per configuration)
+  config = 0
+  for i,pin in enumerate(__seqgen_config_pins):
+    if not __is_tied_low(p[pin]):
+      config |= 1 << i
+  if 'Q'  in p: config |= __seqgen_q_bit
+  if 'QN' in p: config |= __seqgen_qn_bit
+
+  if config in __seqgen_shapes:
+    shape = __seqgen_shapes[config]
+  else:
+    shape = __seqgen_shapes[config] = __seqgen_shape(config)
+
+  # Not sure what to do with the synchronous toggle pin (couldn't find the RTL
+  # that synthesizes this configuration pin, could be rare / unused?)
+  if shape is None:
+    logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
+    return InstanceList(instance.module, [], [instance])
+
+  (en_pin, reset_pin, set_pin, data_pin, sens_pins) = shape
+
+  # OUTPUT pins
+  (Q,  width) = __seqgen_output( p.get('Q'),  regs, assigns )
+  (QN, width) = __seqgen_output( p.get('QN'), regs, assigns, width )
+
+  # Main data assign block
+  DATA = p[data_pin]
+  assigns = []
+  if Q:  assigns.append(NonblockingSubstitution(Lvalue(Q),  Rvalue(DATA)))
+  if QN: assigns.append(NonblockingSubstitution(Lvalue(QN), Rvalue(Unot(DATA))))
+  stmt = Block(assigns)
+
+  # Add enable if it exists
+  if en_pin:
+    stmt = IfStatement(p[en_pin], stmt, None)
+
+  # Add set if it exists
+  if set_pin:
+    assigns = []
+    if Q:  assigns.append(NonblockingSubstitution(Lvalue(Q),  Rvalue(__seqgen_const('1', width))))
+    if QN: assigns.append(NonblockingSubstitution(Lvalue(QN), Rvalue(__seqgen_const('0', width))))
+    stmt = IfStatement(p[set_pin], Block(assigns), stmt)
+
+  # Add reset if it exists
+  if reset_pin:
+    assigns = []
+    if Q:  assigns.append(NonblockingSubstitution(Lvalue(Q),  Rvalue(__seqgen_const('0', width))))
+    if QN: assigns.append(NonblockingSubstitution(Lvalue(QN), Rvalue(__seqgen_const('1', width))))
+    stmt = IfStatement(p[reset_pin], Block(assigns), stmt)
+
+  # Create the sensitivity list (a merged register has one entry for each bit
+  # of a level sensitive data pin, see bsg_reg_bus_opt.py)
+  sens = []
+  for pin,t in sens_pins:
+    if type(p[pin]) == Concat:
+      sens.extend([Sens(s, type=t) for s in p[pin].list])
+    else:
+      sens.append(Sens(p[pin], type=t))
+
+  # Return always block AST
+  return Always(SensList(sens), stmt if type(stmt) == Block else Block([stmt]))
+
+# __seqgen_output( pin, regs, assigns, width=1 )
+#
+# Create the reg for a SEQGEN output pin along with the assign that drives the
+# pin from the reg. The pin is a net, a bit of a bus or, for a register merged
+# by bsg_reg_bus_opt.py, a part-select of a bus. Returns the identifier of the
+# reg (None if the pin is not connected) and its width in bits.
+#
+def __seqgen_output( pin, regs, assigns, width=1 ):
+
+  if type(pin) == Pointer:
+    name = pin.var.name + "_%d_sv2v_reg" % int(pin.ptr.value)
+    regs[name] = Reg(name,None)
+  elif type(pin) == Identifier:
+    name = pin.name + "_sv2v_reg"
+    regs[name] = Reg(name,None)
+  elif type(pin) == Partselect:
+    # A bus with more than one register gets a name for each bit range
+    name = pin.var.name + "_sv2v_reg"
+    if name in regs:
+      name = pin.var.name + "_%s_%s_sv2v_reg" % (pin.msb.value, pin.lsb.value)
+    regs[name] = Reg(name, Width(pin.msb, pin.lsb))
+    width = abs(int(pin.msb.value) - int(pin.lsb.value)) + 1
+  else:
+    return (None, width)
+
+  assigns.append(Assign(Lvalue(pin), Rvalue(Identifier(name))))
+  return (Identifier(name), width)
+
+# __seqgen_const( bit, width )
+#
+# Constant with every bit of the given width set to bit ('0' or '1').
+#
+def __seqgen_const( bit, width ):
+  if width == 1:
+    return IntConst('1\'b' + bit)
+  return Repeat(Concat([IntConst('1\'b' + bit)]), IntConst(str(width)))
+
+# __seqgen_shape( config )
+#
+# Work out the shape of the always block for a SEQGEN configuration bitmask.
+# Returns a tuple with the names of the enable, reset, set and data pins (None
+# if unused) and the (pin, type) pairs of the sensitivity list, or None for a
+# configuration that has no implementation.
+#
+def __seqgen_shape( config ):
+
   # Get configuration booleans
-  has_clock              = (p['clocked_on']   != IntConst('1\'b0'))
-  has_async_reset        = (p['clear']        != IntConst('1\'b0'))
-  has_async_set          = (p['preset']       != IntConst('1\'b0'))
-  has_async_enable       = (p['enable']       != IntConst('1\'b0'))
-  has_async_data         = (p['data_in']      != IntConst('1\'b0'))
-  has_sync_reset         = (p['synch_clear']  != IntConst('1\'b0'))
-  has_sync_set           = (p['synch_preset'] != IntConst('1\'b0'))
-  has_sync_enable        = (p['synch_enable'] != IntConst('1\'b0'))
-  has_sync_data          = (p['next_state']   != IntConst('1\'b0'))
-  has_sync_toggle        = (p['synch_toggle'] != IntConst('1\'b0'))
-  has_noninverted_output = ('Q' in p)
-  has_inverted_output    = ('QN' in p)
-
-  sync_enable_hi         = (p['synch_enable'] == IntConst('1\'b1'))
+  has = dict((pin, bool(config & (1 << i))) for i,pin in enumerate(__seqgen_config_pins))
+  has_clock              = has['clocked_on']
+  has_async_reset        = has['clear']
+  has_async_set          = has['preset']
+  has_async_enable       = has['enable']
+  has_async_data         = has['data_in']
+  has_sync_reset         = has['synch_clear']
+  has_sync_set           = has['synch_preset']
+  has_sync_enable        = has['synch_enable']
+  has_sync_data          = has['next_state']
+  has_sync_toggle        = has['synch_toggle']
+  has_noninverted_output = bool(config & __seqgen_q_bit)
+  has_inverted_output    = bool(config & __seqgen_qn_bit)
 
   # Log configuration
   logging.debug('SEQGEN Configuration:')
-  logging.debug(('\t %s: '+('\t'*3)+'%s') % ('has_clock', str(has_clock)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_async_reset', str(has_async_reset)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_async_set', str(has_async_set)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_async_enable', str(has_async_enable)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_async_data', str(has_async_data)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_sync_reset', str(has_sync_reset)))
-  logging.debug(('\t %s: '+('\t'*3)+'%s') % ('has_sync_set', str(has_sync_set)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_sync_enable', str(has_sync_enable)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_sync_data', str(has_sync_data)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_sync_toggle', str(has_sync_toggle)))
-  logging.debug(('\t %s: '+('\t'*1)+'%s') % ('has_noninverted_output', str(has_noninverted_output)))
-  logging.debug(('\t %s: '+('\t'*2)+'%s') % ('has_inverted_output', str(has_inverted_output)))
+  logging.debug('\t %s: '+('\t'*3)+'%s', 'has_clock', has_clock)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_async_reset', has_async_reset)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_async_set', has_async_set)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_async_enable', has_async_enable)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_async_data', has_async_data)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_sync_reset', has_sync_reset)
+  logging.debug('\t %s: '+('\t'*3)+'%s', 'has_sync_set', has_sync_set)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_sync_enable', has_sync_enable)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_sync_data', has_sync_data)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_sync_toggle', has_sync_toggle)
+  logging.debug('\t %s: '+('\t'*1)+'%s', 'has_noninverted_output', has_noninverted_output)
+  logging.debug('\t %s: '+('\t'*2)+'%s', 'has_inverted_output', has_inverted_output)
 
   # Assert all assumptions before moving on to early catch unexpected configurations
   assert not ( has_async_reset and has_sync_reset )
@@ -58,94 +186,47 @@ def SEQGEN( instance, wires, regs, assigns ):
   assert not ( has_clock and has_async_data )
   assert (has_noninverted_output or has_inverted_output)
 
-  # Not sure what to do with the synchronous toggle pin (couldn't find the RTL
-  # that synthesizes this configuration pin, could be rare / unused?)
   if has_sync_toggle:
-    logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
-    return InstanceList(instance.module, [], [instance])
+    return None
 
   # EN pin
-  if has_sync_enable:    EN = p['synch_enable']
-  elif has_async_enable: EN = p['enable']
+  if has_sync_enable:    EN = 'synch_enable'
+  elif has_async_enable: EN = 'enable'
   else:                  EN = None
 
   # RESET pin
-  if has_sync_reset:                            RESET = p['synch_clear']
-  elif has_async_reset:                         RESET = p['clear']
+  if has_sync_reset:                            RESET = 'synch_clear'
+  elif has_async_reset:                         RESET = 'clear'
   # Special case, it seems that async reset can be represented with a
   # async enable without async data
-  elif has_async_enable and not has_async_data: RESET = p['enable']
+  elif has_async_enable and not has_async_data: RESET = 'enable'
   else:                                         RESET = None
 
   # SET pin
-  if has_sync_set:    SET = p['synch_preset']
-  elif has_async_set: SET = p['preset']
+  if has_sync_set:    SET = 'synch_preset'
+  elif has_async_set: SET = 'preset'
   else:               SET = None
 
   # DATA pin
-  DATA = p['data_in'] if has_async_data else p['next_state']
-
-  # OUTPUT pins
-  if has_noninverted_output and type(p['Q']) == Pointer:
-    name = p['Q'].var.name + "_%d_sv2v_reg" % int(p['Q'].ptr.value)
-    regs.append(Reg(name,None))
-    Q = Identifier(name)
-    assigns.append(Assign(Lvalue(p['Q']), Rvalue(Q)))
-  elif has_noninverted_output and type(p['Q']) == Identifier:
-    name = p['Q'].name + "_sv2v_reg"
-    regs.append(Reg(name,None))
-    Q = Identifier(name)
-    assigns.append(Assign(Lvalue(p['Q']), Rvalue(Q)))
-  else:
-    Q = None
-
-  if has_inverted_output and type(p['QN']) == Pointer:
-    name = p['QN'].var.name + "_%d_sv2v_reg" % int(p['QN'].ptr.value)
-    regs.append(Reg(name,None))
-    QN = Identifier(name)
-    assigns.append(Assign(Lvalue(p['QN']), Rvalue(QN)))
-  elif has_inverted_output and type(p['QN']) == Identifier:
-    name = p['QN'].name + "_sv2v_reg"
-    regs.append(Reg(name,None))
-    QN = Identifier(name)
-    assigns.append(Assign(Lvalue(p['QN']), Rvalue(QN)))
-  else:
-    QN = None
+  DATA = 'data_in' if has_async_data else 'next_state'
 
-  # Main data assign block
-  assigns = []
-  if Q:  assigns.append(NonblockingSubstitution(Lvalue(Q),  Rvalue(DATA)))
-  if QN: assigns.append(NonblockingSubstitution(Lvalue(QN), Rvalue(Unot(DATA))))
-  stmt = Block(assigns)
-
-  # Add enable if it exists
-  if EN:
-    stmt = IfStatement(EN, stmt, None)
-
-  # Add set if it exists
-  if SET:
-    assigns = []
-    if Q:  assigns.append(NonblockingSubstitution(Lvalue(Q),  Rvalue(IntConst('1\'b1'))))
-    if QN: assigns.append(NonblockingSubstitution(Lvalue(QN), Rvalue(IntConst('1\'b0'))))
-    stmt = IfStatement(SET, Block(assigns), stmt)
-
-  # Add reset if it exists
-  if RESET:
-    assigns = []
-    if Q:  assigns.append(NonblockingSubstitution(Lvalue(Q),  Rvalue(IntConst('1\'b0'))))
-    if QN: assigns.append(NonblockingSubstitution(Lvalue(QN), Rvalue(IntConst('1\'b1'))))
-    stmt = IfStatement(RESET, Block(assigns), stmt)
-
-  # Create the sensitivity list
+  # Sensitivity list
   sens = []
-  if has_clock:        sens.append( Sens(p['clocked_on'], type='posedge') )
-  if has_async_data:   sens.append( Sens(p['data_in'],    type='level') )
-  if has_async_enable: sens.append( Sens(p['enable'],     type='level') )
-  if has_async_reset:  sens.append( Sens(p['clear'],      type='level') )
-  if has_async_set:    sens.append( Sens(p['preset'],     type='level') )
-
-  # Return always block AST
-  return Always(SensList(sens), stmt if type(stmt) == Block else Block([stmt]))
+  if has_clock:        sens.append( ('clocked_on', 'posedge') )
+  if has_async_data:   sens.append( ('data_in',    'level') )
+  if has_async_enable: sens.append( ('enable',     'level') )
+  if has_async_reset:  sens.append( ('clear',      'level') )
+  if has_async_set:    sens.append( ('preset',     'level') )
+
+  return (EN, RESET, SET, DATA, tuple(sens))
+
+# __is_tied_low( pin )
+#
+# Check if the pin is tied to the constant 1'b0 without building a new
+# IntConst to compare against.
+#
+def __is_tied_low( pin ):
+  return type(pin) == IntConst and pin.value == '1\'b0'
 
 # generic tristate cell
 def TSGEN( instance, wires, regs, assigns ):
@@ -389,162 +389,162 @@ def GTECH_TBUF( instance ):
 ################################################################################
 
 def GTECH_ISO1_EN0( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_ISO1_EN1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_ISO0_EN0( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_ISO0_EN1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_ISOLATCH_EN0( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_ISOLATCH_EN1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_INBUF( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_OUTBUF( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_INOUTBUF( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD14( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD18( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD1S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD2( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD24( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD28( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD2S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD3( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD34( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD38( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD3S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD4( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD44( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD48( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FD4S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK1S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK2( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK2S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK3( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK3S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK4( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_FJK4S( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LD1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LD2( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LD2_1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LD3( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LD4( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LD4_1( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def GTECH_LSR0( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
@@ -0,0 +1,169 @@
+'''
+bsg_incremental.py
+
+This file contains the functions used for incremental reconversion. After a
+small RTL change most modules in the elaborated netlist come out byte for byte
+identical, so a manifest is kept from the previous run with a hash of each
+module's input text, the conversion flags and a pointer to the converted text.
+On the next run, the converted text is reused for every unchanged module and
+only the modules that changed are parsed and converted.
+'''
+
+import os
+import re
+import glob
+import json
+import hashlib
+import logging
+import collections
+
+from bsg_convert_module import convert_module_spans
+
+from bsg_cell_registry import cell_library_files
+
+# Name of the manifest file inside the incremental directory
+__manifest_name = 'manifest.json'
+
+# Suffix for the converted text of each module in the incremental directory.
+# Only files named with a hash and this suffix are ever removed, so anything
+# else in the directory (such as the netlist or the output) is left alone.
+__output_suffix = '.inc.v'
+__output_re     = re.compile(r'^[0-9a-f]{64}' + re.escape(__output_suffix) + r'$')
+
+# Options that change the converted text of a module
+__option_names = ( 'reg_bus_opt'
+                 , 'wire_reg_decl_opt'
+                 , 'always_at_redux_opt'
+                 , 'dead_net_opt'
+                 , 'net_inline_opt'
+                 , 'assign_redux_opt'
+                 , 'concat_redux_opt'
+                 , 'wrapper'
+                 , 'design_name' )
+
+# Grab the module name from the first line of a module span
+__module_name_re = re.compile(r'^\s*module\s+(\\\S+|[A-Za-z_][\w$]*)')
+
+# conversion_fingerprint( options )
+#
+# Hash everything other than the module text that affects the converted output.
+# This is the optimization flags, the DESIGN_NAME used by the wrapper pass and
+# the source of the conversion scripts themselves (and of any extra cell
+# libraries) so that a change to any pass does not reuse stale output.
+#
+def conversion_fingerprint( options ):
+  h = hashlib.sha256()
+  for n in __option_names:
+    h.update(('%s=%s\0' % (n, getattr(options, n))).encode())
+  h.update(('DESIGN_NAME=%s\0' % os.environ.get('DESIGN_NAME')).encode())
+  scripts = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+  for f in scripts + cell_library_files():
+    with open(f, 'rb') as fid:
+      h.update(fid.read())
+  return h.hexdigest()
+
+# incremental_module_spans( spans, options, jobs, inc_dir )
+#
+# Drop-in replacement for convert_module_spans(...) that reuses the converted
+# text from the previous run for every span whose text and conversion flags
+# have not changed. Changed spans are passed on to convert_module_spans(...)
+# and the (text, counts, wrapper) tuples are yielded in the original module
+# order. The
+# manifest is rewritten and unused output files are removed once every span
+# has been yielded.
+#
+def incremental_module_spans( spans, options, jobs, inc_dir ):
+
+  os.makedirs(inc_dir, exist_ok=True)
+
+  fingerprint  = conversion_fingerprint( options )
+  old_manifest = __manifest_load( inc_dir )
+  new_manifest = dict()
+
+  # Spans in file order waiting to be yielded. Each is either a reused entry
+  # or a converted span whose result comes back from convert_module_spans.
+  pending = collections.deque()
+
+  reused    = 0
+  converted = 0
+
+  def changed_spans():
+    nonlocal reused, converted
+    for lineno, text in spans:
+      m = __module_name_re.match(text)
+      name   = m.group(1) if m else 'line_%d' % lineno
+      digest = hashlib.sha256(text.encode()).hexdigest()
+      entry  = old_manifest.get(name)
+      if entry and entry['digest'] == digest and entry['fingerprint'] == fingerprint \
+               and os.path.isfile(os.path.join(inc_dir, entry['output'])):
+        reused += 1
+        pending.append((name, entry, False))
+      else:
+        converted += 1
+        entry = { 'digest'      : digest
+                , 'fingerprint' : fingerprint
+                , 'output'      : hashlib.sha256((digest+fingerprint).encode()).hexdigest() + __output_suffix }
+        pending.append((name, entry, True))
+        yield (lineno, text)
+
+  for text, counts, wrapper in convert_module_spans( changed_spans(), options, jobs ):
+    while not pending[0][2]:
+      yield __reuse_entry( inc_dir, new_manifest, *pending.popleft() )
+    name, entry, _ = pending.popleft()
+    with open(os.path.join(inc_dir, entry['output']), 'w') as fid:
+      fid.write(text)
+    entry['counts']  = counts
+    entry['wrapper'] = wrapper
+    new_manifest[name] = entry
+    yield (text, counts, wrapper)
+
+  while pending:
+    yield __reuse_entry( inc_dir, new_manifest, *pending.popleft() )
+
+  logging.info('Incremental conversion: %d modules reused, %d modules converted.', reused, converted)
+
+  __manifest_store( inc_dir, new_manifest )
+
+  # Remove output text that is no longer referenced by the manifest
+  keep = set(e['output'] for e in new_manifest.values())
+  for f in glob.glob(os.path.join(inc_dir, '*' + __output_suffix)):
+    name = os.path.basename(f)
+    if name not in keep and __output_re.match(name):
+      os.remove(f)
+
+# __reuse_entry( inc_dir, new_manifest, name, entry, converted )
+#
+# Read back the converted text for an unchanged module and carry its manifest
+# entry over to the new manifest. The (small) wrapper text is kept in the
+# manifest entry itself.
+#
+def __reuse_entry( inc_dir, new_manifest, name, entry, converted ):
+  logging.debug('Reusing converted text for module: %s', name)
+  new_manifest[name] = entry
+  with open(os.path.join(inc_dir, entry['output']), 'r') as fid:
+    return (fid.read(), tuple(entry['counts']), entry.get('wrapper', ''))
+
+# __manifest_load( inc_dir )
+#
+# Load the manifest from the previous run (empty if there isn't one).
+#
+def __manifest_load( inc_dir ):
+  try:
+    with open(os.path.join(inc_dir, __manifest_name), 'r') as fid:
+      return json.load(fid)
+  except FileNotFoundError:
+    return dict()
+  except ValueError as e:
+    logging.warning('Ignoring unreadable incremental manifest: %s', e)
+    return dict()
+
+# __manifest_store( inc_dir, manifest )
+#
+# Write the manifest for this run. It is written to a temporary file first so
+# an interrupted run never leaves a partial manifest behind.
+#
+def __manifest_store( inc_dir, manifest ):
+  path = os.path.join(inc_dir, __manifest_name)
+  with open(path + '.tmp', 'w') as fid:
+    json.dump(manifest, fid, indent=2, sort_keys=True)
+  os.replace(path + '.tmp', path)
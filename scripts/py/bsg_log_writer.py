@@ -0,0 +1,40 @@
+'''
+bsg_log_writer.py
+
+This file contains an optional background log writer. At the debug log level
+the conversion can produce a very large log and, when the output is piped
+through tee, every log line is a synchronous write that stalls the conversion.
+With the background writer, log records are put on a queue and a separate
+thread formats and writes them.
+'''
+
+import os
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# start_log_writer( level, fmt )
+#
+# Configure the root logger with the given level and format so that every
+# record is handed to a background thread to be written to stderr. The thread
+# is stopped (after writing every queued record) when the script exits. Forked
+# worker processes don't have the writer thread, so they write directly to
+# stderr instead.
+#
+def start_log_writer( level, fmt ):
+
+  stream = logging.StreamHandler()
+  stream.setFormatter(logging.Formatter(fmt))
+
+  records  = queue.SimpleQueue()
+  listener = logging.handlers.QueueListener(records, stream)
+
+  root = logging.getLogger()
+  root.setLevel(level)
+  root.handlers = [logging.handlers.QueueHandler(records)]
+
+  os.register_at_fork(after_in_child=lambda: setattr(root, 'handlers', [stream]))
+
+  listener.start()
+  atexit.register(listener.stop)
@@ -0,0 +1,372 @@
+'''
+bsg_netlist_ir.py
+
+This file contains a compact representation for the cell instances of an
+elaborated netlist. Nearly every statement in an elaborated netlist is a single
+instance with named port connections to a net, a bit of a net or a constant,
+and parsing each of these with pyverilog builds a deep graph of InstanceList,
+Instance, PortArg, Pointer, Identifier and IntConst objects only for the swap
+to throw it away. Instead, the instance statements of each module are read
+directly into a CellTable, which stores every instance in flat arrays with
+integer ids for the cell types, port names, nets and constants. Only the rest
+of the module (declarations, assigns, etc.) is parsed with pyverilog.
+
+A CellTable sits in the module items in place of the instances it holds. The
+swap lowers one instance at a time to a short lived pyverilog Instance right
+before calling its replacement function, so the instance AST is never built
+for the whole netlist.
+'''
+
+import re
+import array
+
+from pyverilog.vparser.ast import *
+
+from bsg_netlist_stream import iter_module_spans, parse_module_span
+
+# Version of the CellTable format. CellTables are pickled in the parsed AST
+# cache (see bsg_parse_cache.py), so this must be bumped whenever the fields or
+# the encoding of the connections change.
+CELL_TABLE_VERSION = 1
+
+# A CellTable holds a run of consecutive cell instances in a module. The pins
+# of instance i are pin_ports[pin_start[i]:pin_start[i+1]] (ids into
+# port_names) and the matching pin_sigs (see __SIG_NET etc.).
+class CellTable(Node):
+  __slots__ = ( 'type_names', 'port_names', 'nets', 'consts', 'exprs'
+              , 'type_ids', 'names', 'pin_start', 'pin_ports', 'pin_sigs' )
+  attr_names = ()
+  def __init__(self, lineno=0):
+    self.lineno     = lineno
+    self.type_names = []               ;# Cell type name for each type id
+    self.port_names = []               ;# Port name for each port id
+    self.nets       = []               ;# Net name for each net id
+    self.consts     = []               ;# Constant text for each constant id
+    self.exprs      = []               ;# Part selects and concats
+    self.type_ids   = array.array('i') ;# Cell type id of each instance
+    self.names      = []               ;# Name of each instance
+    self.pin_start  = array.array('i', [0])
+    self.pin_ports  = array.array('i')
+    self.pin_sigs   = array.array('q')
+  def children(self):
+    return ()
+
+# Every connection is stored as a single integer with the kind in the low two
+# bits. An unconnected pin is stored as -1.
+__SIG_NET   = 0 ;# Whole net: net id
+__SIG_BIT   = 1 ;# Bit of a net: bit << 32 | net id
+__SIG_CONST = 2 ;# Constant: constant id
+__SIG_EXPR  = 3 ;# Part select or concat: index into exprs
+
+# Name of the placeholder instance that marks where a CellTable goes in the
+# module items while the rest of the module is parsed
+__table_module = '\\bsg_sv2v_cell_table'
+
+# Anything that could hide a ';' or needs the preprocessor. Modules with any of
+# these are left to pyverilog.
+__unsafe_re = re.compile(r'//|/\*|"|`|\(\*')
+
+# Instance statement: type, instance name and the named port connections
+__instance_re = re.compile(r'\s*(\\\S+|[A-Za-z_][\w$]*)\s+(\\\S+|[A-Za-z_][\w$]*)\s*\((.*)\)\s*', re.S)
+
+# Start of a named port connection
+__pin_re = re.compile(r'\s*\.\s*(\\\S+|[A-Za-z_][\w$]*)\s*\(\s*')
+
+# Net, bit or part select of a net, or a constant
+__sig_re = re.compile( r"(\\\S+|[A-Za-z_][\w$]*)(?:\s*\[\s*(0|[1-9]\d*)\s*(?::\s*(0|[1-9]\d*)\s*)?\])?"
+                       r"|(\d+'[sS]?[bBoOdDhH][0-9a-fA-FxXzZ_?]+|0|[1-9]\d*)" )
+
+__space_re = re.compile(r'\s*')
+
+# Keywords that can never be a cell type
+__keywords = frozenset(( 'module', 'endmodule', 'input', 'output', 'inout', 'wire', 'reg'
+                       , 'tri', 'supply0', 'supply1', 'assign', 'always', 'initial'
+                       , 'parameter', 'localparam', 'defparam', 'integer', 'real'
+                       , 'genvar', 'function', 'task', 'begin', 'end', 'if', 'else'
+                       , 'case', 'for', 'while', 'generate' ))
+
+# read_module_span( lineno, text )
+#
+# Drop in replacement for parse_module_span(...) from bsg_netlist_stream.py.
+# The instance statements in the span are read into CellTables and the rest of
+# the span is parsed with pyverilog. Returns the tuple of definitions found in
+# the span. Line numbers of the parsed items match the original file.
+#
+def read_module_span( lineno, text ):
+
+  if __unsafe_re.search(text):
+    return parse_module_span( lineno, text )
+
+  tables = []
+  rest   = []
+  reader = None
+
+  chunks = text.split(';')
+  for chunk in chunks[:-1]:
+
+    if reader is None:
+      reader = __new_reader()
+    table = reader[0]
+
+    if __read_instance(reader, chunk):
+      # Keep the line count of the removed statement. The first statement of a
+      # run is replaced by the placeholder for the table.
+      if len(table.names) == 1:
+        head = len(chunk) - len(chunk.lstrip())
+        rest.append(chunk[:head] + '%s  table_%d ( );' % (__table_module, len(tables)) + '\n' * chunk.count('\n', head))
+        tables.append(table)
+      else:
+        rest.append('\n' * chunk.count('\n'))
+    else:
+      rest.append(chunk + ';')
+      if table.names:
+        reader = None
+
+  rest.append(chunks[-1])
+
+  if not tables:
+    return parse_module_span( lineno, text )
+
+  definitions = parse_module_span( lineno, ''.join(rest) )
+
+  for module in definitions:
+    if type(module) != ModuleDef:
+      continue
+    items = [__table_or_item(item, tables) for item in module.items]
+    module.items = tuple(items) if type(module.items) == tuple else items
+
+  return definitions
+
+# read_netlist( fid )
+#
+# Read a whole elaborated netlist one module span at a time with
+# read_module_span(...) and return a single Source AST just like the parser
+# does. The netlist is not preprocessed (see bsg_netlist_stream.py).
+#
+def read_netlist( fid ):
+  definitions = []
+  for lineno, text in iter_module_spans( fid ):
+    definitions.extend( read_module_span( lineno, text ) )
+  return Source('', Description(tuple(definitions)))
+
+# has_directives( filename )
+#
+# Check if a file contains a compiler directive (or anything else with a
+# backtick). Such a netlist has to be preprocessed, so it can't be read with
+# read_netlist(...).
+#
+def has_directives( filename ):
+  with open(filename, 'rb') as fid:
+    for chunk in iter(lambda: fid.read(1 << 20), b''):
+      if b'`' in chunk:
+        return True
+  return False
+
+# cell_table_instances( table )
+#
+# Generator that lowers every instance in the table to a pyverilog Instance in
+# order. The nets and constants are lowered once and shared by every instance
+# in the table (nodes are never modified in place by the passes).
+#
+def cell_table_instances( table ):
+
+  leaves    = dict()
+  ports     = table.port_names
+  types     = table.type_names
+  pin_ports = table.pin_ports
+  pin_sigs  = table.pin_sigs
+  start     = table.pin_start
+
+  for i,name in enumerate(table.names):
+    portlist = []
+    for j in range(start[i], start[i+1]):
+      sig  = pin_sigs[j]
+      leaf = leaves.get(sig)
+      if leaf is None and sig != -1:
+        leaf = leaves[sig] = __lower_sig(table, sig)
+      portlist.append(PortArg(ports[pin_ports[j]], leaf))
+    yield Instance(types[table.type_ids[i]], name, tuple(portlist), ())
+
+# cell_table_count( items )
+#
+# Number of items in the list counting each instance in a CellTable as an
+# item (the number of items the module would have had without the tables).
+#
+def cell_table_count( items ):
+  count = len(items)
+  for item in items:
+    if type(item) == CellTable:
+      count += len(item.names) - 1
+  return count
+
+# __new_reader()
+#
+# Start reading instance statements into a new CellTable. The reader is the
+# table along with the intern dicts for the type names, port names, nets and
+# constants, which are only kept while reading.
+#
+def __new_reader():
+  return (CellTable(), dict(), dict(), dict(), dict())
+
+# __read_instance( reader, chunk )
+#
+# Read the text of one statement (without the ';') into the table of the
+# reader. Returns False and leaves the table unchanged if it is not an instance
+# that can be read.
+#
+def __read_instance( reader, chunk ):
+
+  m = __instance_re.fullmatch(chunk)
+  if m is None or m.group(1) in __keywords:
+    return False
+
+  pins = __read_pins(m.group(3))
+  if pins is None:
+    return False
+
+  table, types, ports = reader[0], reader[1], reader[2]
+  table.type_ids.append(__intern(types, table.type_names, m.group(1)))
+  table.names.append(m.group(2))
+  for port, expr in pins:
+    table.pin_ports.append(__intern(ports, table.port_names, port))
+    table.pin_sigs.append(__encode_sig(reader, expr))
+  table.pin_start.append(len(table.pin_ports))
+  return True
+
+# __encode_sig( reader, expr )
+#
+# Encode a connection read by __read_pins(...) as a single integer (see
+# __SIG_NET etc.).
+#
+def __encode_sig( reader, expr ):
+  table, nets, consts = reader[0], reader[3], reader[4]
+  if expr is None:
+    return -1
+  kind = expr[0]
+  if kind == 'net':
+    return __intern(nets, table.nets, expr[1]) << 2 | __SIG_NET
+  if kind == 'bit':
+    return (expr[2] << 32 | __intern(nets, table.nets, expr[1])) << 2 | __SIG_BIT
+  if kind == 'const':
+    return __intern(consts, table.consts, expr[1]) << 2 | __SIG_CONST
+  if kind == 'part':
+    table.exprs.append(('part', __intern(nets, table.nets, expr[1]), expr[2], expr[3]))
+  else:
+    table.exprs.append(('concat', tuple([__encode_sig(reader, e) for e in expr[1]])))
+  return (len(table.exprs) - 1) << 2 | __SIG_EXPR
+
+# __intern( ids, names, name )
+#
+# Return the id of the name, adding it to the names list if it is new.
+#
+def __intern( ids, names, name ):
+  i = ids.get(name)
+  if i is None:
+    i = ids[name] = len(names)
+    names.append(name)
+  return i
+
+# __read_pins( text )
+#
+# Read the named port connections of an instance. Returns a list of (port,
+# expr) tuples or None if any connection is something other than a net, a bit
+# or part select of a net, a constant, a concat of those or nothing. An expr is
+# a tuple of ('net', name), ('bit', name, bit), ('part', name, msb, lsb),
+# ('const', text) or ('concat', [expr, ...]).
+#
+def __read_pins( text ):
+
+  pins = []
+  pos  = 0
+  end  = len(text.rstrip())
+
+  while pos < end:
+    m = __pin_re.match(text, pos)
+    if m is None:
+      return None
+    port = m.group(1)
+    pos  = m.end()
+
+    if text.startswith(')', pos):
+      expr = None
+    elif text.startswith('{', pos):
+      items = []
+      pos   = __space_re.match(text, pos+1).end()
+      while True:
+        sig, pos = __read_sig(text, pos)
+        if sig is None:
+          return None
+        items.append(sig)
+        pos = __space_re.match(text, pos).end()
+        if text.startswith(',', pos):
+          pos = __space_re.match(text, pos+1).end()
+        elif text.startswith('}', pos):
+          pos = __space_re.match(text, pos+1).end()
+          break
+        else:
+          return None
+      expr = ('concat', items)
+    else:
+      expr, pos = __read_sig(text, pos)
+      if expr is None:
+        return None
+
+    pos = __space_re.match(text, pos).end()
+    if not text.startswith(')', pos):
+      return None
+    pos = __space_re.match(text, pos+1).end()
+    if text.startswith(',', pos):
+      pos += 1
+    elif pos < end:
+      return None
+
+    pins.append((port, expr))
+
+  return pins
+
+# __read_sig( text, pos )
+#
+# Read a net, bit or part select of a net or a constant at pos. Returns the
+# expr (see __read_pins) or None and the position after it.
+#
+def __read_sig( text, pos ):
+  m = __sig_re.match(text, pos)
+  if m is None:
+    return (None, pos)
+  name, msb, lsb, const = m.groups()
+  if const is not None:
+    return (('const', const), m.end())
+  if msb is None:
+    return (('net', name), m.end())
+  if lsb is None:
+    return (('bit', name, int(msb)), m.end())
+  return (('part', name, int(msb), int(lsb)), m.end())
+
+# __lower_sig( table, sig )
+#
+# Build the pyverilog AST for an encoded connection.
+#
+def __lower_sig( table, sig ):
+  kind = sig & 3
+  sig  = sig >> 2
+  if kind == __SIG_NET:
+    return Identifier(table.nets[sig])
+  if kind == __SIG_BIT:
+    return Pointer(Identifier(table.nets[sig & 0xffffffff]), IntConst(str(sig >> 32)))
+  if kind == __SIG_CONST:
+    return IntConst(table.consts[sig])
+  expr = table.exprs[sig]
+  if expr[0] == 'part':
+    return Partselect(Identifier(table.nets[expr[1]]), IntConst(str(expr[2])), IntConst(str(expr[3])))
+  return Concat(tuple([__lower_sig(table, s) for s in expr[1]]))
+
+# __table_or_item( item, tables )
+#
+# Swap a placeholder instance for its CellTable.
+#
+def __table_or_item( item, tables ):
+  if type(item) == InstanceList and item.module == __table_module:
+    table = tables[int(item.instances[0].name[len('table_'):])]
+    table.lineno = item.lineno
+    return table
+  return item
@@ -0,0 +1,68 @@
+'''
+bsg_netlist_stream.py
+
+This file contains the functions used to read an elaborated netlist one module
+at a time rather than parsing the whole file into a single AST. Each
+"module ... endmodule" span is pulled out of the file text and parsed on its
+own so that peak memory depends on the largest module instead of the whole
+design. DesignCompiler does not write macros or includes into the elaborated
+netlist so the iverilog preprocessing step is skipped.
+'''
+
+import re
+import logging
+
+from pyverilog.vparser.parser import VerilogParser
+
+# Lines that open and close a module definition
+__module_re    = re.compile(r'^\s*module\b')
+__endmodule_re = re.compile(r'^\s*endmodule\b')
+
+# The parser builds its LALR tables when constructed so a single instance is
+# created on first use and then reused for every span.
+__parser = None
+
+# iter_module_spans( fid )
+#
+# Generator that reads the open file one line at a time and yields a
+# (lineno, text) tuple for every module definition found. The lineno is the
+# line number of the "module" keyword in the original file. Anything outside of
+# a module definition (comments, blank lines, etc.) is dropped.
+#
+def iter_module_spans( fid ):
+
+  lines  = None
+  lineno = 0
+
+  for i, line in enumerate(fid, 1):
+    if lines is None:
+      if __module_re.match(line):
+        lines  = [line]
+        lineno = i
+    else:
+      lines.append(line)
+      if __endmodule_re.match(line):
+        yield (lineno, ''.join(lines))
+        lines = None
+
+  if lines is not None:
+    logging.error('Reached end of file inside module starting at line %d!', lineno)
+    yield (lineno, ''.join(lines))
+
+# parse_module_span( lineno, text )
+#
+# Parse the text for a single module span and return the tuple of definitions
+# found in it (normally just the one ModuleDef). Line numbers in the returned
+# AST match the line numbers in the original file.
+#
+def parse_module_span( lineno, text ):
+
+  global __parser
+  if __parser is None:
+    __parser = VerilogParser()
+
+  # The lexer keeps counting lines across calls to parse so it is rewound to
+  # the first line of the span every time.
+  __parser.lexer.lexer.lineno = lineno
+
+  return __parser.parse(text).description.definitions
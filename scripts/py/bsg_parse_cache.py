@@ -0,0 +1,140 @@
+'''
+bsg_parse_cache.py
+
+This file contains a small on-disk cache for parsed ASTs. Parsing with
+pyverilog is the most expensive step of the conversion, and the python stage is
+often rerun on an unchanged elaborated netlist (for example to toggle an
+optimization pass). Entries are keyed by a hash of the parsed text, the
+pyverilog version and the CellTable format version, stored as pickles and
+evicted oldest first once the cache grows past a size cap.
+'''
+
+import os
+import pickle
+import hashlib
+import logging
+import tempfile
+
+from pyverilog.utils.version import VERSION as PYVERILOG_VERSION
+from pyverilog.vparser.ast import Node
+
+from bsg_netlist_ir import CellTable, CELL_TABLE_VERSION
+
+# Pickles of the AST node classes with __slots__ (see
+# patches/pyverilog_ast_slots.patch) and without can not be loaded by each
+# other, so the layout is part of the cache key
+__node_layout = b'slots' if hasattr(Node, '__slots__') else b'dict'
+
+# The cached ASTs hold CellTables (see bsg_netlist_ir.py), so their format
+# version and fields are part of the cache key as well
+__cell_table_layout = ('%d:%s' % (CELL_TABLE_VERSION, ','.join(CellTable.__slots__))).encode()
+
+# Suffix for every cache entry in the cache directory
+__suffix = '.ast.pkl'
+
+# cache_key( *parts )
+#
+# Create a cache key from the pyverilog version and the given parts (strings or
+# bytes). Any change to the parsed text, the parser version, the layout of the
+# AST node classes or the CellTable format results in a new key.
+#
+def cache_key( *parts ):
+  h = hashlib.sha256()
+  h.update(PYVERILOG_VERSION.encode())
+  h.update(__node_layout)
+  h.update(__cell_table_layout)
+  for p in parts:
+    h.update(b'\0')
+    h.update(p if type(p) == bytes else str(p).encode())
+  return h.hexdigest()
+
+# file_digest( filename )
+#
+# Hash the content of a file without reading the whole thing into memory.
+#
+def file_digest( filename ):
+  h = hashlib.sha256()
+  with open(filename, 'rb') as fid:
+    for chunk in iter(lambda: fid.read(1<<20), b''):
+      h.update(chunk)
+  return h.hexdigest()
+
+# cache_load( cache_dir, key )
+#
+# Return the object stored for the key or None if there is no such entry. A hit
+# refreshes the modification time of the entry so eviction is least recently
+# used.
+#
+def cache_load( cache_dir, key ):
+  path = os.path.join(cache_dir, key + __suffix)
+  try:
+    with open(path, 'rb') as fid:
+      obj = pickle.load(fid)
+  except FileNotFoundError:
+    return None
+  except Exception as e:
+    logging.warning('Ignoring unreadable cache entry %s: %s', path, e)
+    return None
+  os.utime(path)
+  return obj
+
+# cache_store( cache_dir, key, obj )
+#
+# Store the object for the key. The entry is written to a temporary file and
+# then renamed so concurrent readers (or workers writing the same entry) never
+# see a partial file. The cache is only an optimization, so any failure (such
+# as a full disk) is a warning and the temporary file is always cleaned up.
+#
+def cache_store( cache_dir, key, obj ):
+  tmp = None
+  try:
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as fid:
+      os.chmod(tmp, 0o644)
+      pickle.dump(obj, fid, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, os.path.join(cache_dir, key + __suffix))
+    tmp = None
+  except Exception as e:
+    logging.warning('Unable to cache AST: %s', e)
+  finally:
+    if tmp is not None:
+      try:
+        os.remove(tmp)
+      except OSError:
+        pass
+
+# cache_evict( cache_dir, max_bytes )
+#
+# Remove the least recently used entries until the total size of the cache is
+# at most max_bytes. Another run sharing the cache directory may remove or
+# replace entries at the same time, so an entry that has already gone is
+# skipped.
+#
+def cache_evict( cache_dir, max_bytes ):
+
+  if not os.path.isdir(cache_dir):
+    return
+
+  entries = []
+  total   = 0
+  for name in os.listdir(cache_dir):
+    if not name.endswith(__suffix):
+      continue
+    try:
+      st = os.stat(os.path.join(cache_dir, name))
+    except FileNotFoundError:
+      continue
+    entries.append((st.st_mtime, st.st_size, name))
+    total += st.st_size
+
+  entries.sort()
+  for mtime, size, name in entries:
+    if total <= max_bytes:
+      break
+    logging.debug('Evicting cache entry: %s', name)
+    try:
+      os.remove(os.path.join(cache_dir, name))
+    except FileNotFoundError:
+      pass
+    total -= size
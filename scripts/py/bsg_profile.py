@@ -0,0 +1,153 @@
+'''
+bsg_profile.py
+
+This file contains the profiling support behind the -profile option. When
+enabled, the wall time and memory of each step (parse, swap, each optimization
+pass, wrapper and codegen) are recorded along with a per-module breakdown and
+the time spent in each replacement function by cell type. The memory of a step
+is the largest RSS sampled when the step finishes and the growth of the peak
+RSS of the process while the step ran. The
+report is written as JSON when the script exits. Optionally, the whole run is
+also profiled with cProfile and the stats dumped for use with pstats.
+
+When profiling is not enabled every function here returns right away, and the
+hot paths only check profile_enabled() once per module.
+'''
+
+import os
+import sys
+import time
+import json
+import atexit
+import logging
+import resource
+import collections
+
+# Profile data for this run (None when profiling is disabled)
+__profile = None
+
+# Peak RSS of the process when the last step finished
+__last_peak_rss_kb = 0
+
+# profile_start( json_path, pstats_path=None )
+#
+# Enable profiling. The JSON report is written to json_path when the script
+# exits. If pstats_path is given, the whole run is also profiled with cProfile
+# and the stats are dumped there.
+#
+def profile_start( json_path, pstats_path=None ):
+
+  global __profile, __last_peak_rss_kb
+  __last_peak_rss_kb = __peak_rss_kb()
+  __profile = { 'start'   : time.perf_counter()
+              , 'steps'   : collections.OrderedDict()
+              , 'modules' : []
+              , 'cells'   : dict() }
+
+  cprofile = None
+  if pstats_path:
+    import cProfile
+    cprofile = cProfile.Profile()
+    cprofile.enable()
+
+  atexit.register(__profile_finish, json_path, pstats_path, cprofile)
+
+# profile_enabled()
+#
+# Check if profiling is enabled for this run.
+#
+def profile_enabled():
+  return __profile is not None
+
+# profile_step( name, seconds )
+#
+# Add the wall time for one step (steps that happen once per module are summed
+# over every module). This is called right as the step finishes, so the
+# current RSS is sampled (rss_kb is the largest sample over every call) and the
+# growth of the peak RSS of the process since the previous step finished is
+# added to the step (peak_rss_growth_kb).
+#
+def profile_step( name, seconds ):
+  global __last_peak_rss_kb
+  if __profile is None:
+    return
+  step = __profile['steps'].get(name)
+  if step is None:
+    step = __profile['steps'][name] = { 'time' : 0.0, 'calls' : 0, 'rss_kb' : 0, 'peak_rss_growth_kb' : 0 }
+  peak = __peak_rss_kb()
+  step['time']               += seconds
+  step['calls']              += 1
+  step['rss_kb']              = max(step['rss_kb'], __rss_kb())
+  step['peak_rss_growth_kb'] += peak - __last_peak_rss_kb
+  __last_peak_rss_kb = peak
+
+# profile_module( name, items, counts, times )
+#
+# Record the per-module breakdown: the number of items before the swap (every
+# instance in a CellTable counts as one item), the (gtech, synth, generic)
+# replacement counts and a dict of time per pass.
+#
+def profile_module( name, items, counts, times ):
+  if __profile is None:
+    return
+  __profile['modules'].append({ 'name'   : name
+                              , 'items'  : items
+                              , 'counts' : { 'gtech'     : counts[0]
+                                           , 'synthetic' : counts[1]
+                                           , 'generic'   : counts[2] }
+                              , 'time'   : times })
+
+# profile_cell( cell, seconds )
+#
+# Add the time spent in the replacement function for one instance of a cell.
+#
+def profile_cell( cell, seconds ):
+  if __profile is None:
+    return
+  entry = __profile['cells'].get(cell)
+  if entry is None:
+    entry = __profile['cells'][cell] = { 'count' : 0, 'time' : 0.0 }
+  entry['count'] += 1
+  entry['time']  += seconds
+
+# __profile_finish( json_path, pstats_path, cprofile )
+#
+# Write the JSON report (and the cProfile stats) at exit.
+#
+def __profile_finish( json_path, pstats_path, cprofile ):
+
+  if cprofile is not None:
+    cprofile.disable()
+    cprofile.dump_stats(pstats_path)
+    logging.info('Wrote cProfile stats to: %s', pstats_path)
+
+  report = { 'argv'                 : sys.argv
+           , 'total_time'           : time.perf_counter() - __profile['start']
+           , 'peak_rss_kb'          : __peak_rss_kb()
+           , 'children_peak_rss_kb' : resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+           , 'steps'                : __profile['steps']
+           , 'modules'              : __profile['modules']
+           , 'cells'                : __profile['cells'] }
+
+  with open(json_path, 'w') as fid:
+    json.dump(report, fid, indent=2)
+  logging.info('Wrote profile report to: %s', json_path)
+
+# __peak_rss_kb()
+#
+# Peak resident set size of this process so far in kilobytes.
+#
+def __peak_rss_kb():
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+# __rss_kb()
+#
+# Current resident set size of this process in kilobytes. Falls back to the
+# peak RSS where /proc is not available.
+#
+def __rss_kb():
+  try:
+    with open('/proc/self/statm', 'r') as fid:
+      return int(fid.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+  except (OSError, ValueError, IndexError):
+    return __peak_rss_kb()
@@ -0,0 +1,171 @@
+'''
+bsg_reg_bus_opt.py
+
+This optimization merges the bit-blasted SEQGEN cells of a register back into
+a single multi-bit SEQGEN before they are replaced. SEQGEN cells that drive
+consecutive bits of the same bus and have identical clock, reset, set, enable
+and other configuration pins are replaced by one SEQGEN whose output pins are a
+part-select of the bus and whose data pin is a concat of the data bits. The
+SEQGEN replacement then creates a single vector reg, one bus-wide assign and
+one vector non-blocking assignment for the whole register rather than one of
+each for every bit.
+'''
+
+import logging
+
+from pyverilog.vparser.ast import *
+
+from bsg_ast_visitor import ast_key
+
+from bsg_cell_registry import lookup_cell
+
+from bsg_utility_funcs import __get_instance_ports
+
+from bsg_generic_modules import SEQGEN, __is_tied_low
+
+# reg_bus_instances( instances, wires )
+#
+# Take an iterator of (instance, item, count) tuples from the swap and yield
+# the same tuples with the SEQGEN cells of each register merged. Every other
+# instance is passed through as it is found. The SEQGEN cells are held back
+# until the iterator is exhausted and then yielded in the order their register
+# was first seen. The count of a merged instance is the number of cells it
+# replaces. The wires are the name keyed declaration table from the swap and
+# are used to find the direction of each bus.
+#
+def reg_bus_instances( instances, wires ):
+
+  groups = dict()
+  for entry in instances:
+    found = __reg_bus_key( entry[0] )
+    if found is None:
+      yield entry
+      continue
+    key, bit, data_pin = found
+    group = groups.get(key)
+    if group is None:
+      group = groups[key] = []
+    group.append((bit, data_pin, entry))
+
+  merged = 0
+  for group in groups.values():
+    for run in __reg_bus_runs( group ):
+      if len(run) == 1:
+        yield run[0][2]
+      else:
+        merged += 1
+        yield (__reg_bus_instance( run, wires ), None, sum([r[2][2] for r in run]))
+
+  logging.info("\t Register bus merge count: %d", merged)
+
+# __reg_bus_key( instance )
+#
+# Work out which register a SEQGEN cell belongs to. Returns a tuple of the
+# register key, the bit of the bus driven by the cell and the name of its data
+# pin, or None if the instance is not a SEQGEN that drives a single constant
+# bit of a bus. Two cells have the same register key when they drive the same
+# bus (or busses for Q and QN) and every pin other than the data and output
+# pins is the same.
+#
+def __reg_bus_key( instance ):
+
+  # Only merge cells handled by the built-in SEQGEN replacement
+  if lookup_cell( instance.module )[2] is not SEQGEN:
+    return None
+
+  p = __get_instance_ports(instance)
+
+  bit   = None
+  buses = list()
+  for pin in ('Q', 'QN'):
+    out = p.get(pin)
+    if out is None:
+      buses.append(None)
+      continue
+    if type(out) != Pointer or type(out.var) != Identifier or out.var.scope is not None:
+      return None
+    b = __const_int(out.ptr)
+    if b is None or (bit is not None and b != bit):
+      return None
+    bit = b
+    buses.append(out.var.name)
+
+  if bit is None or 'data_in' not in p:
+    return None
+
+  data_pin = 'next_state' if __is_tied_low(p['data_in']) else 'data_in'
+  pins = tuple([(pin, ast_key(arg)) for pin,arg in sorted(p.items()) if pin not in ('Q', 'QN', data_pin)])
+
+  return ((instance.module, tuple(buses), data_pin, pins), bit, data_pin)
+
+# __reg_bus_runs( group )
+#
+# Split the cells of a register into runs of consecutive bits in ascending bit
+# order. A bit driven by more than one cell starts a new run.
+#
+def __reg_bus_runs( group ):
+  group.sort(key=lambda g: g[0])
+  runs = [[group[0]]]
+  for g in group[1:]:
+    if g[0] == runs[-1][-1][0] + 1:
+      runs[-1].append(g)
+    else:
+      runs.append([g])
+  return runs
+
+# __reg_bus_instance( run, wires )
+#
+# Create a single SEQGEN instance for a run of cells. The output pins become a
+# part-select of their bus and the data pin a concat of the data bits, both in
+# the declared direction of the bus (descending if the bus is not declared).
+# Every other pin is taken from the first cell.
+#
+def __reg_bus_instance( run, wires ):
+
+  first = run[0][2][0]
+  data_pin = run[0][1]
+  p = __get_instance_ports(first)
+
+  bus = p['Q'] if 'Q' in p else p['QN']
+  if not __is_ascending( wires.get(bus.var.name) ):
+    run = run[::-1]
+  left, right = run[0][0], run[-1][0]
+
+  data = Concat([__get_instance_ports(r[2][0])[data_pin] for r in run])
+
+  portlist = list()
+  for port in first.portlist:
+    pin = port.portname.replace('\\','')
+    if pin == data_pin:
+      arg = data
+    elif pin == 'Q' or pin == 'QN':
+      arg = Partselect(port.argname.var, IntConst(str(left)), IntConst(str(right)))
+    else:
+      arg = port.argname
+    portlist.append(PortArg(port.portname, arg))
+
+  return Instance(first.module, first.name, tuple(portlist), first.parameterlist)
+
+# __is_ascending( decl )
+#
+# Check if a bus is declared with an MSB lower than its LSB.
+#
+def __is_ascending( decl ):
+  if decl is None or decl.width is None:
+    return False
+  msb = __const_int(decl.width.msb)
+  lsb = __const_int(decl.width.lsb)
+  return msb is not None and lsb is not None and msb < lsb
+
+# __const_int( node )
+#
+# Return the integer value of a constant index node or None if the node is not
+# a plain integer constant.
+#
+def __const_int( node ):
+  if type(node) != IntConst:
+    return None
+  try:
+    return int(node.value)
+  except ValueError:
+    return None
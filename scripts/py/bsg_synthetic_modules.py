@@ -197,98 +197,98 @@ def MUX_OP( instance ):
 ################################################################################
 
 def ADD_UNS_CI_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def ADD_TC_CI_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def SUB_UNS_CI_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def SUB_TC_CI_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def MOD_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def DIVREM_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def DIVMOD_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def MOD_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def DIVREM_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def DIVMOD_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def ASH_UNS_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def ASH_TC_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def ASH_TC_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def ASHR_UNS_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def ASHR_TC_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def BSH_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def BSH_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def BSHL_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def BSHR_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def BSHR_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def SLA_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def SLA_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def SRA_UNS_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
 def SRA_TC_OP( instance ):
-  logging.error('No implementation defined for %s replacement!' % sys._getframe().f_code.co_name)
+  logging.error('No implementation defined for %s replacement!', sys._getframe().f_code.co_name)
   return InstanceList(instance.module, [], [instance])
 
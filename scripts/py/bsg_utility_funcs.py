@@ -22,7 +22,9 @@ def __get_instance_ports( instance ):
 ################################################################################
 # Utility function that will take a port and make sure that it is declared as a
 # reg. By default, everything is a wire because the elaborated netlist is just
-# a bunch of module instantiations. Here we will swap those wires to regs.
+# a bunch of module instantiations. Here we will swap those wires to regs. The
+# wires and regs are the name keyed declaration tables from the swap pass so
+# both the check and the swap are constant time.
 ################################################################################
 
 def __convert_pin_to_reg_DEPRICATED( pin, wires, regs ):
@@ -32,18 +34,12 @@ def __convert_pin_to_reg_DEPRICATED( pin, wires, regs ):
   else:
     name = pin.name
 
-  # We first check if it is already a reg. Typically, the reg list is much
-  # smaller than the wire list and it is very common that the net is already a
-  # reg (most common for large multibit registers) therefore this actually has
-  # a significant speedup!
-  for i,reg in enumerate(regs):
-    if name == reg.name:
-      return
-
-  for i,wire in enumerate(wires):
-    if name == wire.name:
-      logging.debug('Swapping %s to reg' % name)
-      wires.pop(i)
-      regs.append(Reg(wire.name, wire.width, wire.signed))
-      return
+  # Already a reg (most common for large multibit registers)
+  if name in regs:
+    return
+
+  wire = wires.pop(name, None)
+  if wire is not None:
+    logging.debug('Swapping %s to reg', name)
+    regs[name] = Reg(wire.name, wire.width, wire.signed)
 
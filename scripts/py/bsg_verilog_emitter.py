@@ -0,0 +1,373 @@
+'''
+bsg_verilog_emitter.py
+
+This file contains a purpose built verilog emitter for the converted netlist.
+pyverilog's ASTCodeGenerator renders every node through a Jinja2 template and
+builds the whole file as a single string before it can be written. The
+converted netlist only contains a small, fixed set of node types, so those are
+formatted here directly (producing exactly the same text as the templates) and
+each module item is written to the file as soon as it is generated. Any other
+node type falls back to ASTCodeGenerator.
+'''
+
+import textwrap
+
+from pyverilog.vparser.ast import *
+from pyverilog.ast_code_generator.codegen import ASTCodeGenerator
+from pyverilog.utils.op2mark import operator_mark, operator_order
+
+from bsg_ast_visitor import ast_fold
+
+# ASTCodeGenerator used for any node type without an emit function. It is only
+# created the first time it is needed.
+__fallback_codegen = None
+
+# emit_verilog( ast, fid )
+#
+# Main entry point. Write the verilog for the whole AST (usually a Source node)
+# to the open file. The text is identical to fid.write(ASTCodeGenerator().visit(ast)).
+#
+def emit_verilog( ast, fid ):
+  if type(ast) == Source:
+    for definition in ast.description.definitions:
+      fid.write('\n')
+      __emit_definition(definition, fid)
+      fid.write('\n')
+  elif type(ast) == Description:
+    for definition in ast.definitions:
+      fid.write('\n')
+      __emit_definition(definition, fid)
+      fid.write('\n')
+  else:
+    __emit_definition(ast, fid)
+
+# emit_node( node )
+#
+# Return the verilog text for a single node. Used for everything below the
+# module item level where the text for each node is small. The text is built
+# bottom up with ast_fold(...) so deep expression trees (long GTECH cascades or
+# SELECT_OP condition chains) don't hit the python recursion limit.
+#
+def emit_node( node ):
+  return ast_fold( node, __emit, __children )
+
+# __children( node ) / __emit( node, values )
+#
+# Dispatch to the child getter and emit function for the node. Lookup is on the
+# exact node type (the same way ASTCodeGenerator dispatches on the class name)
+# so subclasses that are not listed in __emit_funcs fall back to
+# ASTCodeGenerator. Each emit function gets the node and the text generated for
+# every child returned by its child getter (None for a None child).
+#
+def __children( node ):
+  entry = __emit_funcs.get(type(node))
+  if entry is None:
+    return ()
+  return entry[0](node)
+
+def __emit( node, values ):
+  entry = __emit_funcs.get(type(node))
+  if entry is None:
+    return __fallback(node)
+  return entry[1](node, values)
+
+################################################################################
+# Module level. The module header is written first and then each item is
+# generated and written in turn so the module is never held as one string.
+################################################################################
+
+def __emit_definition( node, fid ):
+
+  if type(node) != ModuleDef:
+    fid.write(emit_node(node))
+    return
+
+  paramlist = __indent(emit_node(node.paramlist)) if node.paramlist is not None else ''
+  portlist  = __indent(emit_node(node.portlist))  if node.portlist  is not None else ''
+
+  fid.write('\nmodule ')
+  fid.write(__escape(node.name))
+  if paramlist != '':
+    fid.write(' #\n(\n')
+    fid.write(paramlist)
+    fid.write('\n)')
+  fid.write('\n(\n')
+  fid.write(portlist)
+  fid.write('\n);\n\n')
+
+  if node.items:
+    for item in node.items:
+      fid.write(__indent(emit_node(item)))
+      fid.write('\n')
+
+  fid.write('\nendmodule\n')
+
+def __emit_paramlist( node, values ):
+  if len(node.params) == 0:
+    return ''
+  return __fallback(node)
+
+def __emit_portlist( node, ports ):
+  return ',\n'.join(ports)
+
+def __emit_port( node, values ):
+  return __escape(node.name)
+
+################################################################################
+# Declarations
+################################################################################
+
+def __emit_decl( node, items ):
+  return ''.join(items)
+
+def __emit_variable( keyword ):
+  def func( node, values ):
+    s = keyword
+    if node.signed:
+      s += 'signed '
+    if values[0] is not None:
+      s += values[0] + ' '
+    return s + __escape(node.name) + ';'
+  return func
+
+def __emit_var_list( keyword ):
+  def func( node, values ):
+    name_str = ','.join([__escape(name) for name in node.name_list])
+    # Same line wrapping as the WireList/RegList codegen in the pyverilog patch
+    for i in range(int(len(name_str)/80)):
+      start_index = (i+1)*80 + i
+      comma_index = name_str.rfind(',',0,start_index)
+      name_str = name_str[:comma_index+1] + '\n' + name_str[comma_index+1:]
+    s = keyword
+    if node.signed:
+      s += 'signed '
+    if values[0] is not None:
+      s += values[0] + ' '
+    return s + name_str + ';'
+  return func
+
+def __emit_width( node, values ):
+  msb, lsb = values
+  return '[' + __del_space(__del_paren(msb)) + ':' + __del_space(__del_paren(lsb)) + ']'
+
+################################################################################
+# Expressions
+################################################################################
+
+def __emit_identifier( node, values ):
+  scope = '' if values[0] is None else values[0]
+  return scope + __escape(node.name)
+
+def __emit_value( node, values ):
+  return node.value
+
+def __emit_concat( node, items ):
+  return '{ ' + ', '.join([__del_paren(item) for item in items]) + ' }'
+
+def __emit_repeat( node, values ):
+  times, value = values
+  return '{ ' + __del_paren(times) + __del_paren(value) + ' }'
+
+def __emit_partselect( node, values ):
+  var, msb, lsb = values
+  return var + '[' + __del_space(__del_paren(msb)) + ':' + __del_space(__del_paren(lsb)) + ']'
+
+def __emit_pointer( node, values ):
+  var, ptr = values
+  return var + '[' + __del_paren(ptr) + ']'
+
+def __emit_lrvalue( node, values ):
+  return __del_paren(values[0])
+
+# Operators whose operands keep their parenthesis regardless of precedence
+__paren_ops = (Sll, Srl, Sra, LessThan, GreaterThan, LessEq, GreaterEq, Eq, NotEq, Eql, NotEql)
+
+def __emit_operator( node, values ):
+  left, right = values
+  order  = operator_order.get(type(node).__name__)
+  lorder = operator_order.get(type(node.left).__name__)
+  rorder = operator_order.get(type(node.right).__name__)
+  if not isinstance(node.left, __paren_ops) and lorder is not None and lorder <= order:
+    left = __del_paren(left)
+  if not isinstance(node.right, __paren_ops) and rorder is not None and order > rorder:
+    right = __del_paren(right)
+  return '(' + left + ' ' + operator_mark[type(node).__name__] + ' ' + right + ')'
+
+def __emit_unary_operator( node, values ):
+  return '(' + operator_mark[type(node).__name__] + values[0] + ')'
+
+def __emit_cond( node, values ):
+  cond        = values[0]
+  true_value  = __del_paren(values[1])
+  false_value = __del_paren(values[2])
+  if isinstance(node.false_value, Cond):
+    false_value = '\n' + false_value
+  return '((' + __del_paren(cond) + ')? ' + true_value + ' : ' + false_value + ')'
+
+def __emit_system_call( node, args ):
+  s = '$' + __escape(node.syscall)
+  if len(args) > 0:
+    s += '(' + ', '.join(args) + ')'
+  return s
+
+################################################################################
+# Statements
+################################################################################
+
+def __emit_assign( node, values ):
+  left, right = values
+  return __indent_multiline_assign('assign ' + left + ' = ' + right + ';')
+
+def __emit_always( node, values ):
+  sens_list, statement = values
+  return '\nalways @(' + sens_list + ') ' + statement + '\n'
+
+def __emit_sens_list( node, items ):
+  return ' or '.join(items)
+
+def __emit_sens( node, values ):
+  sig = '*' if node.type == 'all' else values[0]
+  if node.type == 'posedge' or node.type == 'negedge':
+    return node.type + ' ' + sig
+  return sig
+
+def __emit_nonblocking( node, values ):
+  if node.ldelay is not None or node.rdelay is not None:
+    return __fallback(node)
+  left, right = values
+  return __indent_multiline_assign(left + ' <= ' + right + ';')
+
+def __emit_if_statement( node, values ):
+  cond            = values[0]
+  true_statement  = '' if values[1] is None else values[1]
+  false_statement = '' if values[2] is None else values[2]
+  s = 'if(' + __del_paren(cond) + ') ' + true_statement
+  if true_statement == '' or (true_statement[-1] != ' ' and true_statement[-1] != '\n'):
+    s += ' '
+  if true_statement.count('\n') == 0 and false_statement != '':
+    s += '\n'
+  if false_statement != '':
+    s += 'else ' + false_statement
+  return s
+
+def __emit_block( node, statements ):
+  s = 'begin'
+  if node.scope is not None and node.scope != '':
+    s += ' : ' + __escape(node.scope)
+  for statement in statements:
+    s += '\n' + __indent(statement)
+  return s + '\nend'
+
+def __emit_instance_list( node, values ):
+  k = len(node.parameterlist)
+  s = '\n' + __escape(node.module)
+  if k > 0:
+    params = [__indent(p) for p in values[:k]]
+    s += '\n#(' + ','.join(['\n' + p for p in params]) + '\n)'
+  s += ','.join(['\n' + i for i in values[k:]])
+  return s + ';\n'
+
+def __emit_instance( node, values ):
+  array = '' if values[0] is None else values[0]
+  ports = [__indent(p) for p in values[1:]]
+  return __escape(node.name) + array + '\n(' + ','.join(['\n' + p for p in ports]) + '\n)'
+
+def __emit_arg( name_attr ):
+  def func( node, values ):
+    name    = getattr(node, name_attr)
+    argname = '' if values[0] is None else __del_paren(values[0])
+    if name is not None and name != '':
+      return '.' + __escape(name) + '(' + argname + ')'
+    return argname
+  return func
+
+################################################################################
+# Dispatch table. Each node type maps to a function that returns the children
+# to generate text for and the function that combines that text.
+################################################################################
+
+def __no_children( node ):
+  return ()
+
+__emit_funcs = {
+  Paramlist               : (__no_children,                                     __emit_paramlist),
+  Portlist                : (lambda n: n.ports,                                 __emit_portlist),
+  Port                    : (__no_children,                                     __emit_port),
+  Decl                    : (lambda n: n.list,                                  __emit_decl),
+  Input                   : (lambda n: (n.width,),                              __emit_variable('input ')),
+  Output                  : (lambda n: (n.width,),                              __emit_variable('output ')),
+  Inout                   : (lambda n: (n.width,),                              __emit_variable('inout ')),
+  Wire                    : (lambda n: (n.width,),                              __emit_variable('wire ')),
+  Reg                     : (lambda n: (n.width,),                              __emit_variable('reg ')),
+  WireList                : (lambda n: (n.width,),                              __emit_var_list('wire ')),
+  RegList                 : (lambda n: (n.width,),                              __emit_var_list('reg ')),
+  Width                   : (lambda n: (n.msb, n.lsb),                          __emit_width),
+  Identifier              : (lambda n: (n.scope,),                              __emit_identifier),
+  Value                   : (__no_children,                                     __emit_value),
+  IntConst                : (__no_children,                                     __emit_value),
+  Concat                  : (lambda n: n.list,                                  __emit_concat),
+  LConcat                 : (lambda n: n.list,                                  __emit_concat),
+  Repeat                  : (lambda n: (n.times, n.value),                      __emit_repeat),
+  Partselect              : (lambda n: (n.var, n.msb, n.lsb),                   __emit_partselect),
+  Pointer                 : (lambda n: (n.var, n.ptr),                          __emit_pointer),
+  Lvalue                  : (lambda n: (n.var,),                                __emit_lrvalue),
+  Rvalue                  : (lambda n: (n.var,),                                __emit_lrvalue),
+  Cond                    : (lambda n: (n.cond, n.true_value, n.false_value),   __emit_cond),
+  SystemCall              : (lambda n: n.args,                                  __emit_system_call),
+  Assign                  : (lambda n: (n.left, n.right),                       __emit_assign),
+  Always                  : (lambda n: (n.sens_list, n.statement),              __emit_always),
+  SensList                : (lambda n: n.list,                                  __emit_sens_list),
+  Sens                    : (lambda n: (None if n.type == 'all' else n.sig,),   __emit_sens),
+  NonblockingSubstitution : (lambda n: (n.left, n.right),                       __emit_nonblocking),
+  IfStatement             : (lambda n: (n.cond, n.true_statement, n.false_statement), __emit_if_statement),
+  Block                   : (lambda n: n.statements,                            __emit_block),
+  InstanceList            : (lambda n: tuple(n.parameterlist) + tuple(n.instances), __emit_instance_list),
+  Instance                : (lambda n: (n.array,) + tuple(n.portlist),          __emit_instance),
+  PortArg                 : (lambda n: (n.argname,),                            __emit_arg('portname')),
+  ParamArg                : (lambda n: (n.argname,),                            __emit_arg('paramname')),
+}
+
+for __name in operator_mark:
+  __cls = globals()[__name]
+  if issubclass(__cls, UnaryOperator):
+    __emit_funcs[__cls] = (lambda n: (n.right,), __emit_unary_operator)
+  else:
+    __emit_funcs[__cls] = (lambda n: (n.left, n.right), __emit_operator)
+
+del __name, __cls
+
+################################################################################
+# Helpers (these mirror the helpers in pyverilog's codegen.py)
+################################################################################
+
+def __fallback( node ):
+  global __fallback_codegen
+  if __fallback_codegen is None:
+    __fallback_codegen = ASTCodeGenerator()
+  return __fallback_codegen.visit(node)
+
+def __indent( text ):
+  return textwrap.indent(text, '  ')
+
+def __escape( s ):
+  if s.startswith('\\'):
+    return s + ' '
+  return s
+
+def __del_paren( s ):
+  if s.startswith('(') and s.endswith(')'):
+    return s[1:-1]
+  return s
+
+def __del_space( s ):
+  return s.replace(' ', '')
+
+def __indent_multiline_assign( text ):
+  if '\n' not in text:
+    return text
+  texts = text.split('\n')
+  try:
+    p = texts[0].index('=')
+  except ValueError:
+    return text
+  return texts[0] + '\n' + textwrap.indent('\n'.join(texts[1:]), ' ' * (p + 2))